@@ -4,31 +4,97 @@ from langchain_community.utilities import SQLDatabase
 from langchain_groq import ChatGroq
 from langchain_community.agent_toolkits import create_sql_agent
 from dotenv import load_dotenv
+from query_cache import query_cache, get_table_version
+from fast_agent import FastSQLAgent
+from db import get_engine
+from query_guard import QueryGuard, InvalidSQL, QUERY_GUARD_ENABLED, agent_question
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DOTENV_PATH = os.path.join(SCRIPT_DIR, '.env')
 
 load_dotenv() 
 
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT") 
-DB_NAME = os.getenv("DB_NAME")
+DB_TABLE_NAME = "properties"
+SQL_QUERY_TOOL = "sql_db_query"
+# "fast" writes SQL in one LLM call and keeps the ReAct agent as a fallback;
+# "agent" always runs the multi-step ReAct agent.
+CHAT_AGENT_MODE = os.getenv("CHAT_AGENT_MODE", "fast")
+# Checks, rewrites and EXPLAINs every query either agent runs.
+query_guard = QueryGuard(DB_TABLE_NAME) if QUERY_GUARD_ENABLED else None
 
 
-DB_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-DB_TABLE_NAME = "properties"
+class CachingSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase whose queries pass through query_guard first, and whose
+    plain SELECTs are answered from query_cache when the table has not
+    changed. A rejected query comes back as an "Error: ..." observation,
+    like a database error, so the agent can correct it and retry.
+    """
+
+    def run(self, command, fetch="all", include_columns=False, **kwargs):
+        guarded = query_guard is not None and isinstance(command, str)
+        if guarded:
+            try:
+                command = query_guard.rewrite(command, agent_question.get())
+            except InvalidSQL as e:
+                # run_no_throw only catches SQLAlchemyError; anything else
+                # would escape the tool and end the whole agent run.
+                return f"Error: {e}"
+        cacheable = (
+            query_cache is not None
+            and isinstance(command, str)
+            and fetch != "cursor"
+            and not any(kwargs.values())  # bound parameters or execution options
+            and command.lstrip().lower().startswith(("select", "with"))
+        )
+        version = query_cache.current_version() if cacheable else None
+        cache_key = f"{fetch}:{include_columns}:{command}"
+        if cacheable:
+            rows = query_cache.get_rows(cache_key, version)
+            if rows is not None:
+                return rows
+
+        if guarded:
+            # EXPLAIN only for queries that are about to reach MySQL.
+            try:
+                command = query_guard.check(command)
+            except InvalidSQL as e:
+                return f"Error: {e}"
+        if not cacheable:
+            return super().run(command, fetch=fetch, include_columns=include_columns, **kwargs)
+        rows = super().run(command, fetch=fetch, include_columns=include_columns)
+        query_cache.put_rows(cache_key, rows, version)
+        return rows
+
+
+def generated_sql(response):
+    """
+    The SQL behind a response: the fast path's query, or the last one the
+    ReAct agent ran (it must be invoked with return_intermediate_steps).
+    """
+    sql = response.get("sql")
+    for action, _ in response.get("intermediate_steps", []):
+        if getattr(action, "tool", None) == SQL_QUERY_TOOL:
+            tool_input = action.tool_input
+            sql = tool_input.get("query") if isinstance(tool_input, dict) else tool_input
+    return sql
+
 
 def get_sql_agent_executor():
     print("--- DEBUG: Creating SQL Agent ---")
     
     try:
-        db = SQLDatabase.from_uri(
-            DB_URL,
+        # The shared engine from db.py: a pre-pinged pool with statement
+        # timeouts, so a MySQL restart does not break /chat until a redeploy.
+        db = CachingSQLDatabase(
+            get_engine(),
             include_tables=[DB_TABLE_NAME] 
         )
         print("--- DEBUG: Connected to SQLDatabase ---")
+        if query_cache is not None:
+            query_cache.bind(db._engine)
+        if query_guard is not None:
+            query_guard.bind(db._engine)
     except Exception as e:
         print(f"--- FATAL: Could not connect to SQLDatabase: {e} ---")
         return None
@@ -46,11 +112,31 @@ def get_sql_agent_executor():
         llm=llm,
         toolkit=toolkit,
         verbose=True,
+        # The SQL the agent ran is cached next to its answer.
+        agent_executor_kwargs={"return_intermediate_steps": True},
         handle_parsing_errors=True
     )
     
     print("--- DEBUG: SQL Agent Created Successfully ---")
-    return agent_executor
+    if CHAT_AGENT_MODE != "fast":
+        return agent_executor
+
+    def version_func():
+        if query_cache is not None:
+            return query_cache.current_version()
+        return get_table_version(db._engine, DB_TABLE_NAME)
+
+    fast_agent = FastSQLAgent(
+        db, llm, DB_TABLE_NAME, fallback_agent=agent_executor, version_func=version_func, row_cache=query_cache,
+        query_guard=query_guard
+    )
+    try:
+        # Built once now; later rebuilt only when an ingest bumps the table version.
+        fast_agent.refresh_context()
+    except Exception as e:
+        print(f"--- WARNING: Could not build schema context yet: {e} ---")
+    print("--- DEBUG: Fast-path SQL Agent enabled ---")
+    return fast_agent
 
 try:
     sql_agent = get_sql_agent_executor()
@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_inference import git_commit, write_results
+from synthetic_data import DEFAULT_OUTPUT_DIR as DEFAULT_DATA_DIR, DEFAULT_SIZES, write_property_list
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT_DIR = os.path.join(SCRIPT_DIR, "benchmark_results")
+
+
+def peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def run_benchmark(excel_path, rerun):
+    """
+    Runs a full-refresh ETL over excel_path in this process, then
+    optionally a second, incremental run over the same file, which should
+    find nothing to do. Returns one result dict per run.
+    """
+    started = time.perf_counter()
+    import ingest_logic
+    import_seconds = time.perf_counter() - started
+
+    runs = [("initial", True)] + ([("rerun", False)] if rerun else [])
+    results = []
+    for name, full_refresh in runs:
+        started = time.perf_counter()
+        summary = ingest_logic.run_etl(excel_path=excel_path, full_refresh=full_refresh)
+        elapsed = time.perf_counter() - started
+        result = {
+            "run": name,
+            "import_seconds": import_seconds,
+            "elapsed_seconds": elapsed,
+            "rows_total": summary["rows_total"],
+            "rows_selected": summary["rows_selected"],
+            "rows_processed": summary["rows_processed"],
+            "rows_per_second": summary["rows_total"] / elapsed if elapsed > 0 else 0.0,
+            "pipeline_seconds": summary["pipeline"]["elapsed_seconds"],
+            "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+            "peak_child_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        }
+        for stage_name, stage_stats in summary["pipeline"]["stages"].items():
+            result[f"{stage_name}_busy_seconds"] = stage_stats["busy_seconds"]
+            result[f"{stage_name}_utilization"] = stage_stats["utilization"]
+            result[f"{stage_name}_max_queue_depth"] = stage_stats["max_queue_depth"]
+        results.append(result)
+    return results
+
+
+def run_benchmark_subprocess(rows, excel_path, work_dir, rerun, warm_caches):
+    """
+    Each size runs in a fresh interpreter against its own SQLite file and
+    an in-memory Qdrant, so peak memory and model load are per run.
+    """
+    env = dict(os.environ)
+    env.update({
+        "DB_URL": f"sqlite:///{os.path.join(work_dir, f'etl_{rows}.sqlite3')}",
+        "QDRANT_LOCATION": ":memory:",
+        "YOLO_OFFLINE": "1",
+    })
+    if not warm_caches:
+        # Fresh caches, so every floorplan, text and PDF is processed for real.
+        env.update({
+            "FLOORPLAN_CACHE_PATH": os.path.join(work_dir, f"floorplans_{rows}.sqlite3"),
+            "EMBEDDING_CACHE_PATH": os.path.join(work_dir, f"embeddings_{rows}.sqlite3"),
+            "CERTIFICATE_STORE_PATH": os.path.join(work_dir, f"certificates_{rows}.sqlite3"),
+        })
+    payload = json.dumps({"excel_path": excel_path, "rerun": rerun})
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker"],
+        input=payload, capture_output=True, text=True, env=env, cwd=SCRIPT_DIR
+    )
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("BENCHMARK_RESULT "):
+            return [{"rows": rows, **result} for result in json.loads(line[len("BENCHMARK_RESULT "):])]
+    error = (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ["no output"]
+    return [{"rows": rows, "run": "initial", "error": error[0]}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark run_etl on synthetic property spreadsheets.")
+    parser.add_argument("--rows", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where synthetic spreadsheets are kept.")
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet"], default="xlsx",
+                        help="File format the ETL reads, to compare the streaming readers.")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild spreadsheets that already exist.")
+    parser.add_argument("--rerun", action="store_true", help="Also time an incremental run with no changes.")
+    parser.add_argument("--warm-caches", action="store_true",
+                        help="Use the normal floorplan/embedding/certificate caches instead of fresh ones.")
+    parser.add_argument("--output", help="Output path prefix (default: benchmark_results/etl_<time>).")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="smartsense_etl_") as work_dir:
+        for rows in args.rows:
+            excel_path = os.path.join(args.data_dir, f"Property_list_{rows}.{args.format}")
+            if args.regenerate or not os.path.exists(excel_path):
+                excel_path = write_property_list(rows, args.data_dir, file_format=args.format)
+
+            print(f"Running ETL benchmark on {rows} rows...")
+            for result in run_benchmark_subprocess(rows, excel_path, work_dir, args.rerun, args.warm_caches):
+                results.append(result)
+                if "error" in result:
+                    print(f"{rows} rows: FAILED ({result['error']})")
+                else:
+                    print(f"{rows} rows ({result['run']}): {result['elapsed_seconds']:.1f}s, "
+                          f"{result['rows_per_second']:.1f} rows/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "format": args.format,
+        "warm_caches": args.warm_caches,
+        "results": results,
+    }
+    output_prefix = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"etl_{time.strftime('%Y%m%d_%H%M%S')}")
+    write_results(report, output_prefix)
+
+    if any("error" in result for result in results):
+        sys.exit(1)
+
+
+def worker():
+    payload = json.loads(sys.stdin.read())
+    results = run_benchmark(payload["excel_path"], payload["rerun"])
+    print("BENCHMARK_RESULT " + json.dumps(results))
+
+
+if __name__ == '__main__':
+    if "--worker" in sys.argv:
+        worker()
+    else:
+        main()
@@ -0,0 +1,240 @@
+import argparse
+import csv
+import glob
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+DEFAULT_IMAGE_DIRS = [
+    os.path.join(ROOT_DIR, "assets", "images"),
+    os.path.join(ROOT_DIR, "phase_1", "My-First-Project-4", "test", "images"),
+]
+DEFAULT_OUTPUT_DIR = os.path.join(SCRIPT_DIR, "benchmark_results")
+# Metrics compared against a baseline, and whether higher is better.
+REGRESSION_METRICS = {"images_per_second": True, "p95_ms": False, "cold_start_seconds": False}
+
+
+def find_images(image_dirs, limit=None):
+    image_paths = []
+    for image_dir in image_dirs:
+        for pattern in ("*.jpg", "*.jpeg", "*.png"):
+            image_paths.extend(glob.glob(os.path.join(image_dir, pattern)))
+    image_paths = sorted(image_paths)
+    return image_paths[:limit] if limit else image_paths
+
+
+def config_key(config):
+    return (f"{config['backend']}{'-int8' if config['int8'] else ''}"
+            f"/bs{config['batch_size']}/t{config['threads']}/img{config['image_size']}")
+
+
+def run_config(config, image_paths, repeats):
+    """
+    Measures one configuration inside this process. Everything from the
+    first import to the first result counts as cold start, which is what
+    a freshly started API worker pays.
+    """
+    started = time.perf_counter()
+    import inference_logic
+    inference_logic.load_models()
+    inference_logic.parse_floorplans(image_paths[:1], batch_size=1)
+    cold_start = time.perf_counter() - started
+
+    batch_size = config["batch_size"]
+    latencies = []
+    images_done = 0
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for start_index in range(0, len(image_paths), batch_size):
+            batch = image_paths[start_index:start_index + batch_size]
+            call_started = time.perf_counter()
+            if batch_size == 1:
+                outputs = [inference_logic.parse_floorplan(batch[0])]
+            else:
+                outputs = inference_logic.parse_floorplans(batch, batch_size=batch_size)
+            latencies.append(time.perf_counter() - call_started)
+            images_done += len(batch)
+            for output in outputs:
+                if "error" in json.loads(output):
+                    raise RuntimeError(f"Inference failed: {output}")
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        **config,
+        "key": config_key(config),
+        "model_path": inference_logic.model_registry.model_path,
+        "model_checksum": inference_logic.model_registry.model_checksum,
+        "images": images_done,
+        "cold_start_seconds": cold_start,
+        # Latency is per call: one image, or one whole batch when batch_size > 1.
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(latencies_ms.mean()),
+        "ms_per_image": 1000 * elapsed / images_done,
+        "images_per_second": images_done / elapsed,
+    }
+
+
+def run_config_subprocess(config, image_paths, repeats):
+    """
+    Each configuration gets a fresh interpreter, so thread counts and the
+    backend are fixed before torch loads and cold start is measured honestly.
+    """
+    env = dict(os.environ)
+    env.update({
+        "INFERENCE_BACKEND": config["backend"],
+        "FLOORPLAN_INT8": "true" if config["int8"] else "false",
+        "FLOORPLAN_IMAGE_SIZE": str(config["image_size"]),
+        "OMP_NUM_THREADS": str(config["threads"]),
+        "MKL_NUM_THREADS": str(config["threads"]),
+        "OPENBLAS_NUM_THREADS": str(config["threads"]),
+        # Cached results would turn the benchmark into a SQLite benchmark.
+        "FLOORPLAN_CACHE_ENABLED": "false",
+        # Never reach out to the network for settings or asset downloads.
+        "YOLO_OFFLINE": "1",
+    })
+    payload = json.dumps({"config": config, "image_paths": image_paths, "repeats": repeats})
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker"],
+        input=payload, capture_output=True, text=True, env=env, cwd=SCRIPT_DIR
+    )
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("BENCHMARK_RESULT "):
+            return json.loads(line[len("BENCHMARK_RESULT "):])
+    error = (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ["no output"]
+    return {**config, "key": config_key(config), "error": error[0]}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=SCRIPT_DIR, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def write_results(report, output_prefix):
+    os.makedirs(os.path.dirname(output_prefix) or ".", exist_ok=True)
+    with open(f"{output_prefix}.json", "w") as f:
+        json.dump(report, f, indent=2)
+
+    rows = report["results"]
+    fieldnames = []
+    for row in rows:
+        fieldnames.extend(name for name in row if name not in fieldnames)
+    with open(f"{output_prefix}.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Results saved to: {output_prefix}.json and {output_prefix}.csv")
+
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    """Returns a list of human-readable regressions beyond tolerance (a fraction)."""
+    with open(baseline_path) as f:
+        baseline = {row["key"]: row for row in json.load(f)["results"] if "error" not in row}
+
+    regressions = []
+    for row in results:
+        previous = baseline.get(row["key"])
+        if previous is None or "error" in row:
+            continue
+        for metric, higher_is_better in REGRESSION_METRICS.items():
+            old, new = previous[metric], row[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f"{row['key']} {metric}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark floorplan inference latency and throughput.")
+    parser.add_argument("--images", nargs="+", default=DEFAULT_IMAGE_DIRS, help="Directories of floorplan images.")
+    parser.add_argument("--limit", type=int, help="Use at most this many images.")
+    parser.add_argument("--repeats", type=int, default=1, help="Passes over the image set per configuration.")
+    parser.add_argument("--backends", nargs="+", default=["torch"], choices=["torch", "onnxruntime", "openvino"])
+    parser.add_argument("--int8", action="store_true", help="Benchmark the INT8 exports of non-torch backends.")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--threads", nargs="+", type=int, default=[os.cpu_count() or 1])
+    parser.add_argument("--image-sizes", nargs="+", type=int, default=[512])
+    parser.add_argument("--output", help="Output path prefix (default: benchmark_results/inference_<time>).")
+    parser.add_argument("--baseline", help="Earlier results JSON to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed relative slowdown against the baseline before failing.")
+    args = parser.parse_args()
+
+    image_paths = find_images(args.images, args.limit)
+    if not image_paths:
+        print(f"Error: No images found in {args.images}.")
+        sys.exit(1)
+
+    configs = [
+        {"backend": backend, "int8": args.int8 and backend != "torch", "batch_size": batch_size,
+         "threads": threads, "image_size": image_size}
+        for backend, batch_size, threads, image_size in itertools.product(
+            args.backends, args.batch_sizes, args.threads, args.image_sizes
+        )
+    ]
+    print(f"Benchmarking {len(configs)} configurations over {len(image_paths)} images...")
+
+    results = []
+    for config in configs:
+        result = run_config_subprocess(config, image_paths, args.repeats)
+        results.append(result)
+        if "error" in result:
+            print(f"{result['key']}: FAILED ({result['error']})")
+        else:
+            print(f"{result['key']}: cold start {result['cold_start_seconds']:.2f}s, "
+                  f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+                  f"{result['images_per_second']:.2f} images/s")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "image_count": len(image_paths),
+        "repeats": args.repeats,
+        "results": results,
+    }
+    output_prefix = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"inference_{time.strftime('%Y%m%d_%H%M%S')}")
+    write_results(report, output_prefix)
+
+    if any("error" in result for result in results):
+        sys.exit(1)
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\n--- Regressions against baseline ---")
+            for regression in regressions:
+                print(regression)
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+def worker():
+    payload = json.loads(sys.stdin.read())
+    result = run_config(payload["config"], payload["image_paths"], payload["repeats"])
+    print("BENCHMARK_RESULT " + json.dumps(result))
+
+
+if __name__ == '__main__':
+    if "--worker" in sys.argv:
+        worker()
+    else:
+        main()
@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # this is from the PyMuPDF module
+from floorplan_cache import sha256_file
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CERTIFICATE_STORE_PATH = os.getenv("CERTIFICATE_STORE_PATH", os.path.join(SCRIPT_DIR, ".cache", "certificates.sqlite3"))
+CERT_EXTRACT_WORKERS = int(os.getenv("CERT_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def extract_text_from_pdf(pdf_path):
+    pages = []
+    try:
+        doc = fitz.open(pdf_path)
+        for page in doc:
+            pages.append(page.get_text())
+        doc.close()
+    except Exception as e:
+        print(f"Could not parse PDF {pdf_path}. Error: {e}")
+    return "".join(pages).strip()
+
+
+class CertificateStore:
+    """
+    Extracted certificate text, stored once per PDF content hash. A file is
+    only re-hashed when its mtime or size changes, and only PDFs whose hash
+    has never been seen are opened, on a process pool. Callers get back a
+    certificate ID (the content hash) they can reference instead of copying
+    the text around.
+    """
+
+    def __init__(self, path=CERTIFICATE_STORE_PATH, workers=CERT_EXTRACT_WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "rehashed": 0, "extracted": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS certificate_texts ("
+            " certificate_id TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS certificate_files ("
+            " path TEXT PRIMARY KEY,"
+            " mtime REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " certificate_id TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._texts = {}
+
+    def _certificate_id(self, path):
+        stat = os.stat(path)
+        row = self._conn.execute(
+            "SELECT mtime, size, certificate_id FROM certificate_files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size:
+            return row[2]
+
+        certificate_id = sha256_file(path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO certificate_files (path, mtime, size, certificate_id) VALUES (?, ?, ?, ?)",
+            (path, stat.st_mtime, stat.st_size, certificate_id)
+        )
+        self._stats["rehashed"] += 1
+        return certificate_id
+
+    def _cached_text(self, certificate_id):
+        if certificate_id not in self._texts:
+            row = self._conn.execute(
+                "SELECT text FROM certificate_texts WHERE certificate_id = ?", (certificate_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._texts[certificate_id] = row[0]
+        return self._texts[certificate_id]
+
+    def resolve(self, paths):
+        """Returns {path: certificate_id} for every existing path, extracting new PDFs as needed."""
+        with self._lock:
+            resolved = {}
+            to_extract = {}
+            for path in dict.fromkeys(paths):
+                if not os.path.isfile(path):
+                    continue
+                self._stats["lookups"] += 1
+                certificate_id = self._certificate_id(path)
+                resolved[path] = certificate_id
+                if self._cached_text(certificate_id) is None:
+                    to_extract.setdefault(certificate_id, path)
+
+            if to_extract:
+                ids, extract_paths = list(to_extract), list(to_extract.values())
+                if len(extract_paths) > 1 and self.workers > 1:
+                    # spawn rather than fork: the ETL calls this from pipeline
+                    # threads while other threads hold locks and torch state.
+                    with ProcessPoolExecutor(max_workers=min(self.workers, len(extract_paths)),
+                                             mp_context=multiprocessing.get_context("spawn")) as pool:
+                        texts = list(pool.map(extract_text_from_pdf, extract_paths))
+                else:
+                    texts = [extract_text_from_pdf(path) for path in extract_paths]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO certificate_texts (certificate_id, text) VALUES (?, ?)",
+                    list(zip(ids, texts))
+                )
+                self._texts.update(zip(ids, texts))
+                self._stats["extracted"] += len(ids)
+
+            self._conn.commit()
+            return resolved
+
+    def get_text(self, certificate_id):
+        with self._lock:
+            return self._cached_text(certificate_id) or ""
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,70 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "30"))
+# The YOLO predictor is not safe to call from several threads at once.
+# ModelRegistry.predict serializes every caller (including the ETL); one
+# inference thread by default keeps HTTP requests from queueing on that lock.
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "1"))
+INFERENCE_QUEUE_TIMEOUT = float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "10"))
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", "4"))
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", "10"))
+
+
+class WorkQueueTimeout(Exception):
+    def __init__(self, name, timeout):
+        super().__init__(f"Too many concurrent {name} requests; gave up after waiting {timeout:g}s.")
+        self.name = name
+
+
+class WorkLimiter:
+    """
+    Caps how many requests of one class of work run at once. Callers wait
+    for a slot for at most queue_timeout seconds before WorkQueueTimeout
+    is raised, so overload turns into fast errors instead of a pile-up.
+    """
+
+    def __init__(self, name, max_concurrent, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @asynccontextmanager
+    async def slot(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise WorkQueueTimeout(self.name, self.queue_timeout)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+chat_limiter = WorkLimiter("chat", CHAT_MAX_CONCURRENCY, CHAT_QUEUE_TIMEOUT)
+inference_limiter = WorkLimiter("inference", INFERENCE_MAX_CONCURRENCY, INFERENCE_QUEUE_TIMEOUT)
+upload_limiter = WorkLimiter("upload", UPLOAD_MAX_CONCURRENCY, UPLOAD_QUEUE_TIMEOUT)
+
+# CPU-bound model work runs here rather than on the event loop or the
+# shared Starlette threadpool used by plain `def` endpoints.
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_MAX_CONCURRENCY, thread_name_prefix="inference")
+
+
+async def run_inference(func, *args):
+    async with inference_limiter.slot():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(inference_executor, func, *args)
+
+
+async def save_upload(upload_file, destination):
+    """Streams an UploadFile to disk in chunks without blocking the event loop."""
+    async with upload_limiter.slot():
+        with open(destination, "wb") as buffer:
+            while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(buffer.write, chunk)
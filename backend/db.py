@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+load_dotenv()
+
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+DB_NAME = os.getenv("DB_NAME")
+
+# DB_URL overrides the MySQL settings, e.g. with a SQLite URL for benchmarks.
+DB_URL = os.getenv("DB_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Sized for the ETL's MySQL writers plus concurrent chat and search requests.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# MySQL drops idle connections after wait_timeout (8h by default); recycle well before.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+# Per-session MAX_EXECUTION_TIME for SELECTs, in milliseconds (0 turns it off).
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+class PoolMetrics:
+    """Checkout counts, wait times and timeouts for the shared pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "checkout_wait_seconds": 0.0,
+            "max_checkout_wait_seconds": 0.0,
+            "checkout_timeouts": 0,
+            "connections_created": 0,
+            "invalidated": 0,
+        }
+
+    def record_checkout(self, seconds):
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["checkout_wait_seconds"] += seconds
+            self._stats["max_checkout_wait_seconds"] = max(self._stats["max_checkout_wait_seconds"], seconds)
+
+    def increment(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_checkout_wait_ms"] = (
+            stats["checkout_wait_seconds"] * 1000 / stats["checkouts"] if stats["checkouts"] else 0.0
+        )
+        return stats
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.increment("checkout_timeouts")
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - started)
+        return connection
+
+
+def _set_statement_timeout(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {DB_STATEMENT_TIMEOUT_MS}")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url=DB_URL):
+    """
+    Engine with a sized, pre-pinged and recycled pool. Stale connections
+    (e.g. after a MySQL restart) are replaced on checkout instead of
+    failing the request that drew them.
+    """
+    if url.startswith("sqlite"):
+        # SQLite has no server-side timeouts and picks its own pool.
+        engine = create_engine(url, pool_pre_ping=True)
+    else:
+        engine = create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+            connect_args={"connect_timeout": DB_CONNECT_TIMEOUT},
+        )
+        if DB_STATEMENT_TIMEOUT_MS > 0 and engine.dialect.name == "mysql":
+            event.listen(engine, "connect", _set_statement_timeout)
+
+    event.listen(engine, "connect", lambda *args: pool_metrics.increment("connections_created"))
+    event.listen(engine, "invalidate", lambda *args: pool_metrics.increment("invalidated"))
+    return engine
+
+
+def get_engine():
+    """The backend's one shared engine, used by the ETL, the SQL agent and /search."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            print(f"Creating database engine for {DB_URL.split('@')[-1]}...")
+            _engine = create_db_engine(DB_URL)
+    return _engine
+
+
+def get_pool_stats():
+    if _engine is None:
+        return {"engine": None}
+    pool = _engine.pool
+    stats = {"engine": _engine.url.render_as_string(hide_password=True), "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "in_use": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": DB_MAX_OVERFLOW,
+        })
+    stats.update(pool_metrics.get_stats())
+    return stats
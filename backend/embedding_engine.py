@@ -0,0 +1,97 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(SCRIPT_DIR, ".cache", "embeddings.sqlite3"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingEngine:
+    """
+    Wraps a SentenceTransformer so that texts gathered across many rows are
+    encoded together: identical texts are encoded once, previously seen
+    texts come from a persistent cache keyed by (model name, text hash),
+    and the rest are encoded in length-sorted batches to minimise padding.
+    """
+
+    def __init__(self, model, model_name, cache_path=EMBEDDING_CACHE_PATH, batch_size=EMBEDDING_BATCH_SIZE):
+        self.model = model
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.dimension = model.get_sentence_embedding_dimension()
+        self._lock = threading.Lock()
+        self._stats = {"texts": 0, "unique_texts": 0, "cache_hits": 0, "encoded": 0}
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model_name TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model_name, text_hash))"
+        )
+        self._conn.commit()
+
+    def _cache_get(self, hashes):
+        found = {}
+        with self._lock:
+            # SQLite caps bound parameters, so look hashes up in slices.
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model_name = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *chunk]
+                )
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _cache_put(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model_name, text_hash, vector) VALUES (?, ?, ?)",
+                [(self.model_name, digest, vector.astype(np.float32).tobytes()) for digest, vector in items]
+            )
+            self._conn.commit()
+
+    def encode(self, texts):
+        """Returns a float32 array of shape (len(texts), dimension), in input order."""
+        texts = list(texts)
+        hashes = [text_hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))
+
+        vectors = self._cache_get(list(unique))
+        missing = sorted((digest for digest in unique if digest not in vectors), key=lambda d: len(unique[d]))
+
+        for start in range(0, len(missing), self.batch_size):
+            batch_hashes = missing[start:start + self.batch_size]
+            batch_vectors = self.model.encode(
+                [unique[digest] for digest in batch_hashes],
+                batch_size=self.batch_size,
+                convert_to_numpy=True
+            ).astype(np.float32)
+            vectors.update(zip(batch_hashes, batch_vectors))
+            self._cache_put(zip(batch_hashes, batch_vectors))
+
+        with self._lock:
+            self._stats["texts"] += len(texts)
+            self._stats["unique_texts"] += len(unique)
+            self._stats["cache_hits"] += len(unique) - len(missing)
+            self._stats["encoded"] += len(missing)
+
+        output = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for position, digest in enumerate(hashes):
+            output[position] = vectors[digest]
+        return output
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats)
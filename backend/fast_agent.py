@@ -0,0 +1,276 @@
+import asyncio
+import re
+import threading
+import time
+
+from sqlalchemy import inspect, text
+
+from spreadsheet_reader import split_location
+from property_schema import ROOM_COLUMNS
+from query_guard import validate_sql
+
+FAST_PATH_TOP_K = 10
+MAX_DISTINCT_VALUES = 50
+MAX_SAMPLE_CHARS = 80
+MAX_RESULT_CHARS = 4000
+
+SQL_PROMPT = """You write {dialect} queries for a property listings database.
+
+{schema}
+
+Rules:
+- Reply with exactly one SELECT statement and nothing else: no explanation, no code fences.
+- Only query the `{table}` table.
+- Filter cities with city = '...' when the table has a city column; use location LIKE '%...%' only for streets or areas.
+- Unless the question asks for every row, add LIMIT {top_k}.
+
+Question: {question}
+SQL:"""
+
+ANSWER_PROMPT = """Answer the question about property listings using only the SQL result below.
+Be concise. If the result is empty, say that no matching properties were found.
+
+Question: {question}
+SQL: {sql}
+Result: {result}
+Answer:"""
+
+
+def extract_sql(reply):
+    """Pulls the statement out of an LLM reply, tolerating code fences and a leading 'SQL:'."""
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", reply, re.IGNORECASE | re.DOTALL)
+    sql = fenced.group(1) if fenced else reply
+    sql = re.sub(r"^\s*sql\s*:\s*", "", sql, flags=re.IGNORECASE)
+    return sql.strip().rstrip(";").strip()
+
+
+def _truncate(value, limit=MAX_SAMPLE_CHARS):
+    value = str(value).replace("\n", " ")
+    return value if len(value) <= limit else value[:limit] + "..."
+
+
+def _city_of(location):
+    return ", ".join(part for part in split_location(location) if part) or None
+
+
+def build_schema_context(engine, table_name, sample_rows=3):
+    """
+    Describes table_name for the SQL prompt: columns with types and
+    truncated sample values, every seller_type, and the most common
+    cities. Cities are counted in SQL on the indexed city column (or on
+    location, for tables that predate it), never by reading every row.
+    """
+    columns = inspect(engine).get_columns(table_name)
+    column_names = {column["name"] for column in columns}
+    city_column = "city" if "city" in column_names else "location"
+    with engine.connect() as conn:
+        samples = conn.execute(text(f"SELECT * FROM {table_name} LIMIT {int(sample_rows)}")).mappings().all()
+        seller_types = conn.execute(text(
+            f"SELECT seller_type, COUNT(*) FROM {table_name} GROUP BY seller_type ORDER BY COUNT(*) DESC"
+        )).fetchall()
+        city_counts = conn.execute(text(
+            f"SELECT {city_column}, COUNT(*) FROM {table_name} WHERE {city_column} IS NOT NULL "
+            f"GROUP BY {city_column} ORDER BY 2 DESC LIMIT {MAX_DISTINCT_VALUES}"
+        )).fetchall()
+        distinct_cities = conn.execute(text(
+            f"SELECT COUNT(DISTINCT {city_column}) FROM {table_name}"
+        )).scalar()
+
+    lines = [f"Table `{table_name}`:"]
+    for column in columns:
+        values = [_truncate(row[column["name"]]) for row in samples if row[column["name"]] not in (None, "")]
+        example = f" e.g. {' | '.join(values)}" if values else ""
+        lines.append(f"- {column['name']} {column['type']}{example}")
+    room_columns = [column for column in ROOM_COLUMNS.values() if column in column_names]
+    if room_columns:
+        # Typed, indexed copies of floorplan_data (see property_schema.py).
+        lines.append(f"Room counts are in {', '.join(room_columns)} (NULL when the floorplan could not be read); "
+                     "filter on these, never on floorplan_data. listed_on is the listing DATE.")
+    else:
+        lines.append("floorplan_data is JSON of room counts; read it with JSON_EXTRACT(floorplan_data, '$.bedroom').")
+
+    lines.append("seller_type values: " + ", ".join(f"{value} ({count})" for value, count in seller_types if value))
+    if city_column == "city":
+        top_cities = [city for city, _ in city_counts if city]
+    else:
+        top_cities = list(dict.fromkeys(city for city in (_city_of(location) for location, _ in city_counts) if city))
+    lines.append(f"Most common cities ({len(top_cities)} of {distinct_cities}): " + "; ".join(top_cities))
+    return "\n".join(lines)
+
+
+async def agent_events(agent_executor, inputs, sql_tool="sql_db_query"):
+    """
+    Runs a ReAct AgentExecutor and yields the same (event, data) pairs as
+    FastSQLAgent.astream. Its final answer is not token-streamed, so it
+    arrives as a single "token" event.
+    """
+    sql = None
+    output = None
+    async for chunk in agent_executor.astream(inputs):
+        for action in chunk.get("actions", []):
+            if action.tool == sql_tool:
+                tool_input = action.tool_input
+                sql = tool_input.get("query") if isinstance(tool_input, dict) else tool_input
+                yield "sql", {"sql": sql}
+        for step in chunk.get("steps", []):
+            if step.action.tool == sql_tool:
+                yield "rows", {"row_count": None, "preview": _truncate(step.observation, MAX_RESULT_CHARS // 10)}
+        if "output" in chunk:
+            output = chunk["output"]
+            yield "token", {"text": output}
+    yield "answer", {"output": output, "sql": sql, "path": "agent"}
+
+
+class FastSQLAgent:
+    """
+    Answers with one LLM call to write SQL and one to phrase the result,
+    using a schema description built up front instead of the ReAct
+    agent's list/describe/check tool calls. The description is rebuilt
+    when the table version changes (i.e. after an ingest). Anything that
+    goes wrong hands the question to the multi-step fallback agent.
+    """
+
+    def __init__(self, db, llm, table_name, fallback_agent=None, version_func=None, row_cache=None,
+                 top_k=FAST_PATH_TOP_K, query_guard=None):
+        self.db = db
+        self.llm = llm
+        self.table_name = table_name
+        self.fallback_agent = fallback_agent
+        self.version_func = version_func
+        self.row_cache = row_cache
+        self.top_k = top_k
+        self.query_guard = query_guard
+        self._context = None
+        self._context_version = None
+        self._context_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "fast_path": 0,
+            "fallback": 0,
+            "context_builds": 0,
+            "fast_path_seconds": 0.0,
+            "fallback_seconds": 0.0,
+            "fast_path_tokens": 0,
+        }
+        self.last_fallback_reason = None
+
+    def refresh_context(self):
+        version = self.version_func() if self.version_func else None
+        with self._context_lock:
+            if self._context is not None and version == self._context_version:
+                return self._context
+            started = time.perf_counter()
+            self._context = build_schema_context(self.db._engine, self.table_name)
+            self._context_version = version
+        with self._stats_lock:
+            self._stats["context_builds"] += 1
+        print(f"Schema context for '{self.table_name}' built in {time.perf_counter() - started:.2f}s "
+              f"(table version {version}).")
+        return self._context
+
+    def _record(self, key, seconds, tokens=0):
+        with self._stats_lock:
+            self._stats[key] += 1
+            self._stats[f"{key}_seconds"] += seconds
+            if key == "fast_path":
+                self._stats["fast_path_tokens"] += tokens
+
+    @staticmethod
+    def _tokens(message):
+        usage = getattr(message, "usage_metadata", None) or {}
+        return usage.get("total_tokens", 0)
+
+    def _prepare(self, sql, question):
+        if self.query_guard is not None:
+            # The EXPLAIN is left to _execute, which skips it on a cache hit.
+            return self.query_guard.rewrite(sql, question)
+        sql = validate_sql(sql, self.table_name)
+        # EXPLAIN checks syntax and column names without running the query.
+        with self.db._engine.connect() as conn:
+            conn.execute(text(f"EXPLAIN {sql}"))
+        return sql
+
+    def _execute(self, sql):
+        """Returns (columns, rows), served from the row cache while the table is unchanged."""
+        version = self.version_func() if self.version_func and self.row_cache is not None else None
+        cache_key = f"fast:{sql}"
+        if version is not None:
+            cached = self.row_cache.get_rows(cache_key, version)
+            if cached is not None:
+                return cached
+        if self.query_guard is not None:
+            sql = self.query_guard.check(sql)
+        with self.db._engine.connect() as conn:
+            result = conn.execute(text(sql))
+            columns = list(result.keys())
+            rows = [tuple(row) for row in result.fetchall()]
+        if version is not None:
+            self.row_cache.put_rows(cache_key, (columns, rows), version)
+        return columns, rows
+
+    async def _fast_path_events(self, question, usage):
+        schema = await asyncio.to_thread(self.refresh_context)
+        reply = await self.llm.ainvoke(SQL_PROMPT.format(
+            dialect=self.db.dialect, schema=schema, table=self.table_name, top_k=self.top_k, question=question
+        ))
+        usage["tokens"] += self._tokens(reply)
+        sql = await asyncio.to_thread(self._prepare, extract_sql(reply.content), question)
+        yield "sql", {"sql": sql}
+
+        columns, rows = await asyncio.to_thread(self._execute, sql)
+        yield "rows", {"row_count": len(rows), "columns": columns}
+
+        result = str([dict(zip(columns, row)) for row in rows])
+        if len(result) > MAX_RESULT_CHARS:
+            result = result[:MAX_RESULT_CHARS] + "... (truncated)"
+        answer = ""
+        async for chunk in self.llm.astream(ANSWER_PROMPT.format(question=question, sql=sql, result=result)):
+            usage["tokens"] += self._tokens(chunk)
+            if chunk.content:
+                answer += chunk.content
+                yield "token", {"text": chunk.content}
+        yield "answer", {"output": answer, "sql": sql, "path": "fast"}
+
+    async def astream(self, inputs):
+        """
+        Yields (event, data) pairs: "sql", "rows" and "token" as they are
+        produced, "fallback" if the fast path gave up part way, and finally
+        "answer" with the complete response.
+        """
+        question = inputs["input"]
+        started = time.perf_counter()
+        usage = {"tokens": 0}
+        try:
+            async for event, data in self._fast_path_events(question, usage):
+                yield event, data
+            self._record("fast_path", time.perf_counter() - started, usage["tokens"])
+            return
+        except Exception as e:
+            self.last_fallback_reason = f"{type(e).__name__}: {e}"
+            print(f"Fast path failed ({self.last_fallback_reason}); falling back to the SQL agent.")
+            if self.fallback_agent is None:
+                raise
+        yield "fallback", {"reason": self.last_fallback_reason}
+
+        started = time.perf_counter()
+        async for event, data in agent_events(self.fallback_agent, inputs):
+            yield event, data
+        self._record("fallback", time.perf_counter() - started)
+
+    async def ainvoke(self, inputs):
+        # Drain the stream so its timing stats are recorded.
+        response = None
+        async for event, data in self.astream(inputs):
+            if event == "answer":
+                response = {"input": inputs["input"], **data}
+        return response
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        for key in ("fast_path", "fallback"):
+            stats[f"avg_{key}_seconds"] = stats[f"{key}_seconds"] / stats[key] if stats[key] else 0.0
+        stats["avg_fast_path_tokens"] = stats["fast_path_tokens"] / stats["fast_path"] if stats["fast_path"] else 0.0
+        stats["context_version"] = self._context_version
+        stats["last_fallback_reason"] = self.last_fallback_reason
+        return stats
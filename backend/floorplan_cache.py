@@ -0,0 +1,126 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.getenv("FLOORPLAN_CACHE_PATH", os.path.join(SCRIPT_DIR, ".cache", "floorplan_results.sqlite3"))
+CACHE_MAX_ENTRIES = int(os.getenv("FLOORPLAN_CACHE_MAX_ENTRIES", "50000"))
+# Inference worker processes share the cache file, so writers wait for
+# each other's locks this long (seconds) instead of failing at once.
+CACHE_BUSY_TIMEOUT = float(os.getenv("FLOORPLAN_CACHE_BUSY_TIMEOUT", "30"))
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FloorplanResultCache:
+    """
+    Persistent floorplan result cache, keyed by the image content hash,
+    the model weights checksum and the confidence threshold. Entries are
+    evicted least-recently-used first once max_entries is exceeded.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=CACHE_BUSY_TIMEOUT, check_same_thread=False)
+        # WAL lets readers in other processes carry on while one of them writes.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA busy_timeout = {int(CACHE_BUSY_TIMEOUT * 1000)}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS floorplan_results ("
+            " cache_key TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_floorplan_results_last_used"
+            " ON floorplan_results (last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(image_sha256, weights_sha256, conf, image_size):
+        return f"{image_sha256}:{weights_sha256}:{conf}:{image_size}"
+
+    def get(self, key):
+        try:
+            return self._get(key)
+        except sqlite3.OperationalError as e:
+            # A cache that is still locked after the busy timeout is a miss, not a failed parse.
+            print(f"Floorplan result cache unavailable: {e}")
+            self._rollback()
+            return None
+
+    def _get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM floorplan_results WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute(
+                "UPDATE floorplan_results SET last_used = ? WHERE cache_key = ?",
+                (time.time(), key)
+            )
+            self._conn.commit()
+            self._stats["hits"] += 1
+            return row[0]
+
+    def put(self, key, result):
+        try:
+            self._put(key, result)
+        except sqlite3.OperationalError as e:
+            print(f"Could not store floorplan result: {e}")
+            self._rollback()
+
+    def _rollback(self):
+        with self._lock:
+            try:
+                self._conn.rollback()
+            except sqlite3.Error:
+                pass
+
+    def _put(self, key, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO floorplan_results (cache_key, result, last_used) VALUES (?, ?, ?)",
+                (key, result, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM floorplan_results").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM floorplan_results WHERE cache_key IN ("
+                " SELECT cache_key FROM floorplan_results ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            self._stats["evictions"] += overflow
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            (stats["entries"],) = self._conn.execute("SELECT COUNT(*) FROM floorplan_results").fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        return stats
@@ -1,30 +1,329 @@
 import json
 from collections import defaultdict
-import os 
+import hashlib
+import importlib.util
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
 from ultralytics import YOLO
+from floorplan_cache import FloorplanResultCache, sha256_bytes, sha256_file
+
+MODEL_PATH = os.getenv(
+    "MODEL_PATH",
+    r"C:\Users\gauth\OneDrive\Documents\SmartSense\phase_1\floorplan_training\run_1\weights\best.pt"
+)
+# /model/reload only loads weights from under this directory: YOLO
+# checkpoints are pickles, so loading one runs arbitrary code.
+MODEL_WEIGHTS_DIR = os.getenv("MODEL_WEIGHTS_DIR", os.path.dirname(MODEL_PATH))
+# The detector was trained at imgsz=512 (see phase_1/phase_1.py).
+IMAGE_SIZE = int(os.getenv("FLOORPLAN_IMAGE_SIZE", "512"))
+# torch runs MODEL_PATH directly; the others expect the artifacts written
+# next to it by phase_1/export_model.py.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+USE_INT8 = os.getenv("FLOORPLAN_INT8", "false").lower() == "true"
+BATCH_SIZE = int(os.getenv("FLOORPLAN_BATCH_SIZE", "8"))
+DECODE_WORKERS = int(os.getenv("FLOORPLAN_DECODE_WORKERS", "4"))
+CONF_THRESHOLD = float(os.getenv("FLOORPLAN_CONF_THRESHOLD", "0.25"))
+# Optional small student model (see phase_1/distill.py). When set, it runs
+# first and MODEL_PATH only sees the images it is unsure about.
+FAST_MODEL_PATH = os.getenv("FAST_MODEL_PATH", "")
+ESCALATION_CONF = float(os.getenv("FLOORPLAN_ESCALATION_CONF", "0.5"))
+# Two boxes of different classes overlapping this much mean the student
+# could not decide what the room is, so its count cannot be trusted.
+ESCALATION_IOU = float(os.getenv("FLOORPLAN_ESCALATION_IOU", "0.7"))
+USE_RESULT_CACHE = os.getenv("FLOORPLAN_CACHE_ENABLED", "true").lower() == "true"
+
+
+# Python module each exported backend needs at load time.
+BACKEND_RUNTIMES = {"onnxruntime": "onnxruntime", "openvino": "openvino"}
+
+
+def resolve_model_path(model_path=MODEL_PATH, backend=INFERENCE_BACKEND, int8=USE_INT8):
+    """
+    Maps the .pt checkpoint path to the exported model for the chosen
+    backend. Raises RuntimeError when that backend's runtime is not
+    installed, rather than leaving ultralytics to pip-install it mid-load.
+    """
+    if backend == "torch":
+        return model_path
+    runtime = BACKEND_RUNTIMES.get(backend)
+    if runtime is not None and importlib.util.find_spec(runtime) is None:
+        raise RuntimeError(
+            f"INFERENCE_BACKEND={backend} needs the '{runtime}' package; install backend/requirements-inference.txt "
+            "(or build the image with --build-arg INFERENCE_EXTRAS=true)"
+        )
+    stem, _ = os.path.splitext(model_path)
+    if backend == "onnxruntime":
+        return f"{stem}_int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    raise ValueError(f"Unknown INFERENCE_BACKEND '{backend}' (expected torch, onnxruntime or openvino)")
+
+
+def resolve_weights_path(model_path, weights_dir=MODEL_WEIGHTS_DIR):
+    """The real path of model_path if it lies under weights_dir (relative paths are taken from there), else None."""
+    if not weights_dir:
+        return None
+    weights_dir = os.path.realpath(weights_dir)
+    resolved = os.path.realpath(os.path.join(weights_dir, model_path))
+    if os.path.commonpath([weights_dir, resolved]) != weights_dir:
+        return None
+    return resolved
+
+
+def weights_checksum(model_path):
+    # OpenVINO exports are directories, so hash every file inside them.
+    if not os.path.isdir(model_path):
+        return sha256_file(model_path)
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(model_path)):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, model_path).encode("utf-8"))
+            digest.update(sha256_file(path).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Holds one YOLO instance per process so callers stop paying the
+    weight-load cost on every request. The model can be swapped for a
+    new checkpoint at runtime; callers already holding the old instance
+    simply finish on it. The YOLO predictor is not thread-safe, so every
+    forward pass goes through predict(), which runs one at a time per
+    model whichever thread calls it (HTTP requests, the ETL pipeline).
+    """
+
+    def __init__(self, model_path=None):
+        model_path = model_path or resolve_model_path()
+        self.model_path = model_path
+        self.model_checksum = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._predict_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "loads": 0,
+            "predict_wait_seconds": 0.0,
+            "last_load_seconds": 0.0,
+            "warmup_seconds": 0.0,
+            "calls": 0,
+            "total_call_seconds": 0.0,
+            "last_call_seconds": 0.0,
+            "max_call_seconds": 0.0,
+        }
+
+    def _load(self, model_path):
+        print(f"Loading floorplan model from {model_path}...")
+        start = time.perf_counter()
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(model_path)
+        # Exported models do not carry the task, so state it explicitly.
+        model = YOLO(model_path, task="detect")
+        checksum = weights_checksum(model_path)
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self._stats["loads"] += 1
+            self._stats["last_load_seconds"] = elapsed
+        print(f"Floorplan model loaded in {elapsed:.2f}s.")
+        return model, checksum
+
+    def _warmup(self, model):
+        # One dummy pass builds the graph and allocates buffers up front.
+        start = time.perf_counter()
+        dummy = np.zeros((IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8)
+        model(dummy, imgsz=IMAGE_SIZE, verbose=False)
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self._stats["warmup_seconds"] = elapsed
+        print(f"Floorplan model warmed up in {elapsed:.2f}s.")
+
+    def get_model(self):
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model, self.model_checksum = self._load(self.model_path)
+                model = self._model
+        return model
+
+    def warmup(self):
+        model = self.get_model()
+        with self._predict_lock:
+            self._warmup(model)
+
+    def predict(self, images, **kwargs):
+        """Runs the current model over images, serialized with every other caller."""
+        model = self.get_model()
+        waited = time.perf_counter()
+        with self._predict_lock:
+            started = time.perf_counter()
+            results = list(model(images, **kwargs))
+            finished = time.perf_counter()
+        with self._stats_lock:
+            self._stats["predict_wait_seconds"] += started - waited
+        self.record_call(finished - started)
+        return results
+
+    def swap(self, model_path):
+        # Load and warm the new checkpoint before publishing it, so
+        # in-flight requests never see a half-initialised model.
+        model, checksum = self._load(model_path)
+        self._warmup(model)
+        with self._lock:
+            self._model = model
+            self.model_path = model_path
+            self.model_checksum = checksum
+        print(f"Floorplan model swapped to {model_path}.")
+
+    def record_call(self, seconds):
+        with self._stats_lock:
+            self._stats["calls"] += 1
+            self._stats["total_call_seconds"] += seconds
+            self._stats["last_call_seconds"] = seconds
+            self._stats["max_call_seconds"] = max(self._stats["max_call_seconds"], seconds)
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        calls = stats["calls"]
+        stats["avg_call_seconds"] = stats["total_call_seconds"] / calls if calls else 0.0
+        stats["model_path"] = self.model_path
+        stats["model_checksum"] = self.model_checksum
+        stats["backend"] = INFERENCE_BACKEND
+        stats["loaded"] = self._model is not None
+        return stats
+
+
+model_registry = ModelRegistry()
+fast_model_registry = ModelRegistry(resolve_model_path(FAST_MODEL_PATH)) if FAST_MODEL_PATH else None
+result_cache = FloorplanResultCache() if USE_RESULT_CACHE else None
+
+_tier_stats_lock = threading.Lock()
+_tier_stats = {"images": 0, "escalated": 0}
+
+
+def load_models():
+    """Loads every model the detector needs; raises FileNotFoundError with the missing path."""
+    if fast_model_registry is not None:
+        fast_model_registry.get_model()
+    return model_registry.get_model()
+
+
+def warmup_models():
+    if fast_model_registry is not None:
+        fast_model_registry.warmup()
+    model_registry.warmup()
+
+
+def get_tier_stats():
+    if fast_model_registry is None:
+        return None
+    with _tier_stats_lock:
+        stats = dict(_tier_stats)
+    stats["escalation_rate"] = stats["escalated"] / stats["images"] if stats["images"] else 0.0
+    stats["escalation_conf"] = ESCALATION_CONF
+    stats["escalation_iou"] = ESCALATION_IOU
+    stats["fast_model"] = fast_model_registry.get_stats()
+    return stats
+
+
+def _weights_key():
+    # Tiered results depend on both models and on when we escalate.
+    if fast_model_registry is None:
+        return model_registry.model_checksum
+    return (f"{fast_model_registry.model_checksum}:{model_registry.model_checksum}:"
+            f"{ESCALATION_CONF}:{ESCALATION_IOU}")
+
+
+def _cache_key(image_bytes):
+    return FloorplanResultCache.make_key(sha256_bytes(image_bytes), _weights_key(), CONF_THRESHOLD, IMAGE_SIZE)
+
+
+def _needs_escalation(result):
+    """
+    True when the fast model's answer should be re-checked by the large
+    one: nothing was detected, some box is below ESCALATION_CONF, or two
+    boxes of different classes cover the same region.
+    """
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return True
+    if float(boxes.conf.min()) < ESCALATION_CONF:
+        return True
+
+    xyxy = boxes.xyxy.cpu().numpy()
+    classes = boxes.cls.cpu().numpy()
+    top_left = np.maximum(xyxy[:, None, :2], xyxy[None, :, :2])
+    bottom_right = np.minimum(xyxy[:, None, 2:], xyxy[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    areas = (xyxy[:, 2:] - xyxy[:, :2]).prod(axis=1)
+    iou = intersection / np.maximum(areas[:, None] + areas[None, :] - intersection, 1e-9)
+    conflicting = (iou > ESCALATION_IOU) & (classes[:, None] != classes[None, :])
+    return bool(conflicting.any())
+
+
+def _detect(images):
+    """
+    Runs the detector over a list of image paths or arrays and returns one
+    Results per image. With a fast model configured, only the images it
+    is unsure about are re-run on the large model.
+    """
+    if fast_model_registry is None:
+        return model_registry.predict(images, imgsz=IMAGE_SIZE, conf=CONF_THRESHOLD, verbose=False)
+
+    results = fast_model_registry.predict(images, imgsz=IMAGE_SIZE, conf=CONF_THRESHOLD, verbose=False)
+
+    escalate = [index for index, result in enumerate(results) if _needs_escalation(result)]
+    if escalate:
+        accurate = model_registry.predict(
+            [images[index] for index in escalate], imgsz=IMAGE_SIZE, conf=CONF_THRESHOLD, verbose=False
+        )
+        for index, result in zip(escalate, accurate):
+            results[index] = result
+
+    with _tier_stats_lock:
+        _tier_stats["images"] += len(results)
+        _tier_stats["escalated"] += len(escalate)
+    return results
 
-MODEL_PATH = r"C:\Users\gauth\OneDrive\Documents\SmartSense\phase_1\floorplan_training\run_1\weights\best.pt"
 
 def parse_floorplan(image_path: str) -> str:
     try:
-        model = YOLO(MODEL_PATH)
-    except FileNotFoundError:
-        print(f"Error: Model file not found at {MODEL_PATH}")
+        load_models()
+    except FileNotFoundError as e:
+        print(f"Error: Model file not found at {e}")
         print("Please make path is correct.")
-        return json.dumps({"error": f"Model file not found at {MODEL_PATH}"})
+        return json.dumps({"error": f"Model file not found at {e}"})
     except Exception as e:
          return json.dumps({"error": f"Error loading model: {e}"})
 
+    cache_key = None
+    if result_cache is not None and os.path.exists(image_path):
+        with open(image_path, "rb") as f:
+            cache_key = _cache_key(f.read())
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     print(f"Parsing {image_path}...")
-    
+
     try:
-        results = model(image_path)
+        results = _detect([image_path])
     except Exception as e:
         print(f"Error during model inference: {e}")
         return json.dumps({"error": str(e)})
 
-    model_class_names = model.names
-    
+    json_output = json.dumps(count_rooms(results, results[0].names), indent=2)
+    if cache_key is not None:
+        result_cache.put(cache_key, json_output)
+    return json_output
+
+
+def count_rooms(results, model_class_names):
     final_counts = defaultdict(int)
 
     for result in results:
@@ -32,17 +331,121 @@ def parse_floorplan(image_path: str) -> str:
             for box in result.boxes:
                 class_index = int(box.cls)
                 detected_class_name = model_class_names[class_index]
-                
+
                 final_counts[detected_class_name] += 1
 
-    return json.dumps(final_counts, indent=2)
+    return final_counts
+
+
+def _load_image(image_path):
+    """
+    Returns (cache_key, cached_result, image). Images with a cached result
+    are never decoded; unreadable files come back with image=None.
+    """
+    if not os.path.exists(image_path):
+        return None, None, None
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+
+    cache_key = None
+    if result_cache is not None:
+        cache_key = _cache_key(image_bytes)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cache_key, cached, None
+
+    # cv2.imdecode returns None instead of raising on corrupt files.
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return cache_key, None, image
+
+
+def _decoded(future, image_path):
+    # One unreadable file (permissions, I/O errors, a broken cache) must
+    # not cost the rest of the batch its results.
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Error reading {image_path}: {e}")
+        return None, None, e
+
+
+def parse_floorplans(image_paths, batch_size=BATCH_SIZE):
+    """
+    Batched version of parse_floorplan. Images are decoded on a thread
+    pool and fed to the detector batch_size at a time, so each batch
+    costs a single forward pass. Returns one JSON string per input path,
+    in input order.
+    """
+    image_paths = list(image_paths)
+    if not image_paths:
+        return []
+
+    try:
+        load_models()
+    except FileNotFoundError as e:
+        error = json.dumps({"error": f"Model file not found at {e}"})
+        return [error] * len(image_paths)
+    except Exception as e:
+        return [json.dumps({"error": f"Error loading model: {e}"})] * len(image_paths)
+
+    print(f"Parsing {len(image_paths)} floorplans in batches of {batch_size}...")
+    outputs = [None] * len(image_paths)
+
+    batch_starts = list(range(0, len(image_paths), batch_size))
+
+    with ThreadPoolExecutor(max_workers=DECODE_WORKERS) as pool:
+        def submit_decode(start_index):
+            batch_paths = image_paths[start_index:start_index + batch_size]
+            return [pool.submit(_load_image, path) for path in batch_paths]
+
+        # Decode one batch ahead so disk reads overlap with inference.
+        pending = submit_decode(batch_starts[0])
+        for position, start_index in enumerate(batch_starts):
+            loaded = [_decoded(future, path) for future, path in
+                      zip(pending, image_paths[start_index:start_index + batch_size])]
+            if position + 1 < len(batch_starts):
+                pending = submit_decode(batch_starts[position + 1])
+
+            batch_indices = []
+            batch_images = []
+            batch_keys = []
+            for offset, (cache_key, cached, image) in enumerate(loaded):
+                index = start_index + offset
+                if isinstance(image, Exception):
+                    outputs[index] = json.dumps({"error": str(image)})
+                elif cached is not None:
+                    outputs[index] = cached
+                elif image is None:
+                    outputs[index] = json.dumps({"error": "image_file_not_readable"})
+                else:
+                    batch_indices.append(index)
+                    batch_images.append(image)
+                    batch_keys.append(cache_key)
+
+            if not batch_images:
+                continue
+
+            try:
+                results = _detect(batch_images)
+            except Exception as e:
+                print(f"Error during batched model inference: {e}")
+                for index in batch_indices:
+                    outputs[index] = json.dumps({"error": str(e)})
+                continue
+
+            for index, cache_key, result in zip(batch_indices, batch_keys, results):
+                outputs[index] = json.dumps(count_rooms([result], result.names), indent=2)
+                if cache_key is not None:
+                    result_cache.put(cache_key, outputs[index])
+
+    return outputs
 
 
 if __name__ == '__main__':
     if not os.path.exists(MODEL_PATH):
         print(f"Model file {MODEL_PATH} not found.")
 
-    example_image_path = "/home/gauthambharati/SmartSense/phase_1/My-First-Project-4/test/images/68_21_jpg.rf.b96c5c0248796e29350c3d078f7ee2d7.jpg" 
+    example_image_path = "/home/gauthambharati/SmartSense/phase_1/My-First-Project-4/test/images/68_21_jpg.rf.b96c5c0248796e29350c3d078f7ee2d7.jpg"
 
     if os.path.exists(example_image_path):
         json_output = parse_floorplan(example_image_path)
@@ -56,4 +459,4 @@ if __name__ == '__main__':
         print(f"\nError: Example image '{example_image_path}' not found.")
         print("Please update 'example_image_path' to test (infer) the script.")
 
-    
+
@@ -0,0 +1,168 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))  # 0 keeps inference in the API process
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+INFERENCE_REQUEST_TIMEOUT = float(os.getenv("INFERENCE_REQUEST_TIMEOUT", "60"))
+
+
+def _worker_main(task_queue, result_queue):
+    # Imported here so only the worker processes load the detector.
+    startup_error = None
+    try:
+        from inference_logic import parse_floorplans, warmup_models
+        warmup_models()
+    except Exception as e:
+        print(f"Inference worker {os.getpid()} failed to start: {e}")
+        startup_error = RuntimeError(f"Inference worker could not load the detector: {e}")
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        batch_id, image_paths = task
+        if startup_error is not None:
+            # Fail requests fast instead of letting callers time out.
+            result_queue.put((batch_id, startup_error))
+            continue
+        try:
+            outputs = parse_floorplans(image_paths, batch_size=len(image_paths))
+        except Exception as e:
+            outputs = e
+        result_queue.put((batch_id, outputs))
+
+
+class InferenceServer:
+    """
+    A pool of model-holding worker processes fed by a micro-batcher.
+    Requests arriving within max_wait_ms of each other (up to
+    max_batch_size images) are sent to a worker as one batch, and each
+    caller's future is resolved with its own image's result.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS, request_timeout=INFERENCE_REQUEST_TIMEOUT):
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.request_timeout = request_timeout
+        # spawn rather than fork: the parent may already hold torch threads.
+        self._context = multiprocessing.get_context("spawn")
+        self._task_queue = self._context.Queue(maxsize=workers * 2)
+        self._result_queue = self._context.Queue()
+        self._requests = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._batch_ids = itertools.count()
+        self._processes = []
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "max_batch_size_seen": 0}
+
+    def start(self):
+        for _ in range(self.workers):
+            process = self._context.Process(
+                target=_worker_main, args=(self._task_queue, self._result_queue), daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+        for target, name in ((self._batch_loop, "inference-batcher"), (self._result_loop, "inference-results")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Inference server started with {self.workers} workers "
+              f"(max batch {self.max_batch_size}, max wait {self.max_wait * 1000:.0f} ms).")
+
+    def is_running(self):
+        return bool(self._threads) and any(process.is_alive() for process in self._processes)
+
+    def submit(self, image_path):
+        future = Future()
+        self._requests.put((image_path, future))
+        return future
+
+    async def parse(self, image_path):
+        future = self.submit(image_path)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.request_timeout)
+
+    def _batch_loop(self):
+        while True:
+            first = self._requests.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._requests.put(None)
+                    break
+                batch.append(item)
+
+            batch_id = next(self._batch_ids)
+            with self._pending_lock:
+                self._pending[batch_id] = [future for _, future in batch]
+            with self._stats_lock:
+                self._stats["requests"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], len(batch))
+            # Blocks when every worker is busy and the task queue is full.
+            self._task_queue.put((batch_id, [image_path for image_path, _ in batch]))
+
+    def _result_loop(self):
+        while True:
+            message = self._result_queue.get()
+            if message is None:
+                break
+            batch_id, outputs = message
+            with self._pending_lock:
+                futures = self._pending.pop(batch_id, [])
+            for index, future in enumerate(futures):
+                # Callers that timed out cancel their future, possibly
+                # between this check and the set below.
+                if future.done():
+                    continue
+                try:
+                    if isinstance(outputs, Exception):
+                        future.set_exception(outputs)
+                    else:
+                        future.set_result(outputs[index])
+                except InvalidStateError:
+                    continue
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        stats["workers"] = self.workers
+        stats["workers_alive"] = sum(process.is_alive() for process in self._processes)
+        with self._pending_lock:
+            stats["batches_in_flight"] = len(self._pending)
+        stats["queued_requests"] = self._requests.qsize()
+        return stats
+
+    def shutdown(self):
+        self._requests.put(None)
+        for _ in self._processes:
+            self._task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+        self._result_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=10)
+
+
+inference_server = InferenceServer() if INFERENCE_WORKERS > 0 else None
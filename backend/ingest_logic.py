@@ -3,11 +3,15 @@ import json
 import pandas as pd
 import sys
 import uuid
-import fitz  # this is from the PyMuPDF module
+import hashlib
+import threading
+import time
 from tqdm import tqdm
 
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Float, JSON, TEXT
+from sqlalchemy import MetaData, Table, Column, Integer, String, Float, JSON, TEXT, select, delete
 from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import sessionmaker
 from qdrant_client import QdrantClient, models
 from sentence_transformers import SentenceTransformer
@@ -18,34 +22,79 @@ ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
 sys.path.append(ROOT_DIR)
 
 try:
-    from inference_logic import parse_floorplan
-except ImportError:
-    print("Error: Could not import 'parse_floorplan' from 'inference_logic'.")
+    from inference_logic import parse_floorplans
+    from inference_server import inference_server
+    from floorplan_cache import sha256_file
+    from qdrant_uploader import QdrantStreamUploader
+    from embedding_engine import EmbeddingEngine
+    from certificate_store import CertificateStore
+    from pipeline import Pipeline, Stage
+    from spreadsheet_reader import iter_row_batches, count_rows, split_location
+    from query_cache import bump_table_version
+    from db import DB_URL, get_engine
+    from property_schema import (
+        ROOM_TYPES, room_counts, structured_columns, structured_indexes, structured_values, migrate_properties_table
+    )
+except ImportError as e:
+    print(f"Error: Could not import the ETL's backend modules: {e}")
     sys.exit(1)
 
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST") # 'mysql_db'
-DB_PORT = os.getenv("DB_PORT") # '3306'
-DB_NAME = os.getenv("DB_NAME")
-
-MYSQL_DB_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# DB_URL (see db.py) and QDRANT_LOCATION (":memory:" or a local path) let
+# the ETL run against SQLite and an embedded Qdrant, e.g. for benchmark_etl.py.
+MYSQL_DB_URL = DB_URL
 DB_TABLE_NAME = "properties"
-QDRANT_HOST = "localhost"
-QDRANT_PORT = 6333
+QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+QDRANT_LOCATION = os.getenv("QDRANT_LOCATION")
 QDRANT_COLLECTION = "property_search"
+# HNSW graph degree and build-time beam width for the collection.
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+# int8 copies of the vectors stay in RAM for search; the float32 originals
+# are only read to rescore the top candidates, so they can live on disk.
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "true").lower() == "true"
+QDRANT_VECTORS_ON_DISK = os.getenv("QDRANT_VECTORS_ON_DISK", "true").lower() == "true"
 ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
 EXCEL_PATH = os.path.join(ASSETS_DIR, "Property_list.xlsx")
 IMAGE_DIR = os.path.join(ASSETS_DIR, "images")
 CERT_DIR = os.path.join(ASSETS_DIR, "certificates")
 EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
 EMBEDDING_DIMENSION = 384
+MANIFEST_TABLE_NAME = "ingest_manifest"
+MYSQL_CHUNK_SIZE = int(os.getenv("MYSQL_CHUNK_SIZE", "1000"))
+ETL_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", "200"))
+# More than one MySQL writer lets batches commit out of order, so a
+# property repeated across batches may keep an earlier row.
+ETL_MYSQL_WORKERS = int(os.getenv("ETL_MYSQL_WORKERS", "1"))
+MYSQL_MAX_RETRIES = int(os.getenv("MYSQL_MAX_RETRIES", "3"))
+# Properties per Qdrant delete when clearing the stale points of changed properties.
+QDRANT_DELETE_CHUNK_SIZE = int(os.getenv("QDRANT_DELETE_CHUNK_SIZE", "500"))
+RETRYABLE_MYSQL_ERRORS = (1205, 1213)  # lock wait timeout, deadlock
+# MySQL errors caused by a row's own values, so splitting the chunk can
+# isolate them: duplicate key, NULL in a NOT NULL column, out of range,
+# truncated or incorrect value, incorrect string value, too long, and
+# foreign key. pymysql raises some of these as OperationalError.
+ROW_LEVEL_MYSQL_ERRORS = (1048, 1062, 1264, 1265, 1292, 1366, 1406, 1452)
+# Fixed namespace so a property's chunks always map to the same Qdrant point IDs.
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2d0e-3b7a-4f52-9a61-2c8e4d7b9f10")
+# Part of every row fingerprint. Bump it when the records or payloads the
+# ETL writes change shape, so the next ingest rewrites every property.
+FINGERPRINT_VERSION = 3
 metadata = MetaData()
 
+# Shared across ETL runs in the same process, so back-to-back ingests
+# reuse one Qdrant client and embedding model. The connection pool is
+# the backend-wide one from db.py.
+_qdrant_client = None
+_embedding_model = None
+
+def get_db_engine():
+    return get_engine()
+
 def get_db_session():
     print(f"Connecting to Local MySQL at {MYSQL_DB_URL.split('@')[-1]}...")
     try:
-        engine = create_engine(MYSQL_DB_URL)
+        engine = get_db_engine()
         Session = sessionmaker(bind=engine)
         print("Local MySQL connection successful.")
         return engine, Session()
@@ -69,32 +118,129 @@ def setup_mysql_table(engine):
             Column('certificates', String(1024)),
             Column('seller_contact', String(255)),
             Column('metadata_tags', String(1024)),
-            Column('floorplan_data', TEXT) 
+            Column('floorplan_data', TEXT),
+            # Typed copies of floorplan_data, location and listing_date, so
+            # filters are index range scans instead of per-row JSON parsing.
+            *structured_columns(),
+            *structured_indexes(DB_TABLE_NAME),
+            extend_existing=True
+        )
+        manifest_table = Table(
+            MANIFEST_TABLE_NAME,
+            metadata,
+            Column('property_id', String(255), primary_key=True),
+            Column('fingerprint', String(64), nullable=False),
+            extend_existing=True
         )
         metadata.create_all(engine)
-        print(f"MySQL table '{DB_TABLE_NAME}' ensured to exist.")
-        return properties_table
+        migrate_properties_table(engine, properties_table)
+        print(f"MySQL tables '{DB_TABLE_NAME}' and '{MANIFEST_TABLE_NAME}' ensured to exist.")
+        return properties_table, manifest_table
     except Exception as e:
         print(f"--- FATAL ERROR --- Error during table setup: {e}")
         sys.exit(1)
 
 
-def get_qdrant_client_instance():
-    print(f"Connecting to Local Qdrant at {QDRANT_HOST}:{QDRANT_PORT}...")
+def get_qdrant_client():
+    """The shared Qdrant client, without touching the collection."""
+    global _qdrant_client
+    if _qdrant_client is None:
+        if QDRANT_LOCATION == ":memory:":
+            _qdrant_client = QdrantClient(location=QDRANT_LOCATION)
+        elif QDRANT_LOCATION:
+            _qdrant_client = QdrantClient(path=QDRANT_LOCATION)
+        else:
+            _qdrant_client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    return _qdrant_client
+
+
+def payload_index_schema():
+    """Payload field -> index type for every field /search filters or the ETL deletes by."""
+    schema = {
+        "property_id": models.PayloadSchemaType.KEYWORD,
+        "chunk_type": models.PayloadSchemaType.KEYWORD,
+        "price": models.PayloadSchemaType.FLOAT,
+        "city": models.PayloadSchemaType.KEYWORD,
+        "state": models.PayloadSchemaType.KEYWORD,
+        "seller_type": models.PayloadSchemaType.KEYWORD,
+    }
+    for room_type in ROOM_TYPES:
+        schema[f"rooms.{room_type}"] = models.PayloadSchemaType.INTEGER
+    return schema
+
+
+def quantization_config():
+    if not QDRANT_QUANTIZATION:
+        return None
+    return models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+    )
+
+
+def ensure_collection_config(client):
+    """
+    Brings an existing collection up to the configured HNSW parameters and
+    quantization, and creates any missing payload indexes, so collections
+    made before these settings existed are upgraded in place.
+    """
+    info = client.get_collection(collection_name=QDRANT_COLLECTION)
+    hnsw = info.config.hnsw_config
+    if hnsw.m != QDRANT_HNSW_M or hnsw.ef_construct != QDRANT_HNSW_EF_CONSTRUCT:
+        print(f"Updating HNSW config of '{QDRANT_COLLECTION}' to m={QDRANT_HNSW_M}, "
+              f"ef_construct={QDRANT_HNSW_EF_CONSTRUCT}...")
+        client.update_collection(
+            collection_name=QDRANT_COLLECTION,
+            hnsw_config=models.HnswConfigDiff(m=QDRANT_HNSW_M, ef_construct=QDRANT_HNSW_EF_CONSTRUCT)
+        )
+    if QDRANT_QUANTIZATION and info.config.quantization_config is None:
+        print(f"Enabling int8 scalar quantization on '{QDRANT_COLLECTION}'...")
+        client.update_collection(collection_name=QDRANT_COLLECTION, quantization_config=quantization_config())
+
+    ensure_payload_indexes(client, info.payload_schema)
+
+
+def ensure_payload_indexes(client, payload_schema=None):
+    existing = set(payload_schema or {})
+    for field_name, field_schema in payload_index_schema().items():
+        if field_name not in existing:
+            client.create_payload_index(
+                collection_name=QDRANT_COLLECTION, field_name=field_name, field_schema=field_schema
+            )
+    missing = len(set(payload_index_schema()) - existing)
+    if missing:
+        print(f"Created {missing} payload indexes on '{QDRANT_COLLECTION}'.")
+
+
+def get_qdrant_client_instance(recreate=False):
+    print(f"Connecting to Local Qdrant at {QDRANT_LOCATION or f'{QDRANT_HOST}:{QDRANT_PORT}'}...")
     try:
-        client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+        client = get_qdrant_client()
         
         if client.collection_exists(collection_name=QDRANT_COLLECTION):
-             print(f"Qdrant collection '{QDRANT_COLLECTION}' already exists. Recreating...")
-             client.delete_collection(collection_name=QDRANT_COLLECTION)
+            if not recreate:
+                print(f"Qdrant collection '{QDRANT_COLLECTION}' already exists. Reusing it.")
+                try:
+                    ensure_collection_config(client)
+                except Exception as e:
+                    # Searches still work without the tuning, only slower.
+                    print(f"Could not update Qdrant collection config: {e}")
+                return client
+            print(f"Qdrant collection '{QDRANT_COLLECTION}' already exists. Recreating...")
+            client.delete_collection(collection_name=QDRANT_COLLECTION)
         
         client.create_collection(
             collection_name=QDRANT_COLLECTION,
             vectors_config=models.VectorParams(
                 size=EMBEDDING_DIMENSION,
-                distance=models.Distance.COSINE
-            )
+                distance=models.Distance.COSINE,
+                on_disk=QDRANT_VECTORS_ON_DISK
+            ),
+            hnsw_config=models.HnswConfigDiff(m=QDRANT_HNSW_M, ef_construct=QDRANT_HNSW_EF_CONSTRUCT),
+            quantization_config=quantization_config()
         )
+        # Indexes are declared before any points arrive, so filters never
+        # fall back to scanning payloads.
+        ensure_payload_indexes(client)
         print(f"Qdrant collection '{QDRANT_COLLECTION}' created.")
         return client
     except Exception as e:
@@ -103,59 +249,262 @@ def get_qdrant_client_instance():
 
 
 def load_embedding_model():
-    print(f"Loading embedding model '{EMBEDDING_MODEL_NAME}'...")
-    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-    print("Embedding model loaded.")
-    return model
+    global _embedding_model
+    if _embedding_model is None:
+        print(f"Loading embedding model '{EMBEDDING_MODEL_NAME}'...")
+        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        print("Embedding model loaded.")
+    return _embedding_model
 
-def extract_text_from_pdf(pdf_path):
-    text = ""
-    try:
-        doc = fitz.open(pdf_path)
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-    except Exception as e:
-        print(f"Could not parse PDF {pdf_path}. Error: {e}")
-    return text.strip()
+def upsert_statement(engine, table, chunk, key_columns):
+    """
+    MySQL gets INSERT ... ON DUPLICATE KEY UPDATE; SQLite gets
+    INSERT ... ON CONFLICT DO UPDATE on the key columns present in the rows.
+    """
+    if engine.dialect.name == "sqlite":
+        stmt = sqlite_insert(table).values(chunk)
+        return stmt.on_conflict_do_update(
+            index_elements=[name for name in key_columns if name in chunk[0]],
+            set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name not in key_columns}
+        )
+    stmt = mysql_insert(table).values(chunk)
+    return stmt.on_duplicate_key_update(**{
+        c.name: stmt.inserted[c.name]
+        for c in table.columns
+        if c.name not in key_columns
+    })
 
+def _is_row_error(engine, error, error_code):
+    if error.connection_invalidated:
+        return False
+    if engine.dialect.name == "sqlite":
+        # sqlite3 has no error numbers; constraint failures are its per-row errors.
+        return isinstance(error, IntegrityError)
+    return error_code in ROW_LEVEL_MYSQL_ERRORS
 
-def run_etl():
-    print("\n--- Starting: ETL Process ---")
 
-    mysql_engine, db_session = get_db_session()
-    qdrant_client = get_qdrant_client_instance()
-    embedding_model = load_embedding_model()
-    properties_table = setup_mysql_table(mysql_engine)
-    
-    try:
-        df = pd.read_excel(EXCEL_PATH)
-    except FileNotFoundError:
-        print(f"Fatal Error: Excel file not found at {EXCEL_PATH}")
+def _write_chunk(engine, table, chunk, key_columns, max_retries):
+    """
+    Upserts chunk in one transaction, retrying deadlocks and lock wait
+    timeouts. A chunk rejected with a per-row MySQL error (bad value,
+    duplicate key, ...) is split in half and each half written on its
+    own, so one bad row only loses itself. Everything else, from schema
+    errors to lost connections, is raised as it is.
+    Returns (rows written, records that could not be written).
+    """
+    stmt = upsert_statement(engine, table, chunk, key_columns)
+    for attempt in range(max_retries + 1):
+        try:
+            with engine.begin() as conn:
+                conn.execute(stmt)
+            return len(chunk), []
+        except DBAPIError as e:
+            error_code = e.orig.args[0] if e.orig is not None and e.orig.args else None
+            if error_code in RETRYABLE_MYSQL_ERRORS:
+                if attempt < max_retries:
+                    backoff = 0.1 * (2 ** attempt)
+                    print(f"MySQL error {error_code} on '{table.name}' chunk, retrying in {backoff:.1f}s...")
+                    time.sleep(backoff)
+                    continue
+                print(f"Error writing {len(chunk)} rows to '{table.name}': {e}")
+                return 0, list(chunk)
+            if not _is_row_error(engine, e, error_code):
+                # Schema, syntax and connection errors fail every row alike,
+                # so splitting would only repeat them 2n-1 times.
+                raise
+            if len(chunk) == 1:
+                print(f"Error writing row {chunk[0].get('property_id')} to '{table.name}': {e}")
+                return 0, list(chunk)
+            break
+
+    middle = len(chunk) // 2
+    written_left, failed_left = _write_chunk(engine, table, chunk[:middle], key_columns, max_retries)
+    written_right, failed_right = _write_chunk(engine, table, chunk[middle:], key_columns, max_retries)
+    return written_left + written_right, failed_left + failed_right
+
+
+def bulk_upsert(engine, table, records, key_columns=("id", "property_id"),
+                chunk_size=MYSQL_CHUNK_SIZE, max_retries=MYSQL_MAX_RETRIES):
+    """
+    Writes records as multi-row INSERT ... ON DUPLICATE KEY UPDATE
+    statements of chunk_size rows, committing once per chunk. Chunks that
+    hit a deadlock or lock wait timeout are retried with backoff; chunks
+    rejected for a row's values are bisected down to the offending rows,
+    and any other error is raised. Returns the records that could not be
+    written.
+    """
+    failed = []
+    written = 0
+    start = time.perf_counter()
+
+    for chunk_start in range(0, len(records), chunk_size):
+        chunk = records[chunk_start:chunk_start + chunk_size]
+        chunk_written, chunk_failed = _write_chunk(engine, table, chunk, key_columns, max_retries)
+        written += chunk_written
+        failed.extend(chunk_failed)
+
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else 0.0
+    print(f"Upserted {written} rows into '{table.name}' in {elapsed:.2f}s ({rate:.0f} rows/s).")
+    return failed
+
+
+def point_id_for(prop_id, chunk_type, index):
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{prop_id}:{chunk_type}:{index}"))
+
+
+def fingerprint_row(row, file_hash):
+    """
+    Hashes every spreadsheet column of the row (a dict) plus the bytes of
+    the floorplan image and certificate PDFs it references. file_hash is a
+    callable (path -> digest or None) so shared files are hashed once.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"version={FINGERPRINT_VERSION}\x1f".encode("utf-8"))
+    for column in sorted(row):
+        digest.update(f"{column}={row[column]}\x1f".encode("utf-8"))
+
+    referenced_files = [os.path.join(IMAGE_DIR, str(row.get('image_file')))]
+    for cert_file in str(row.get('certificates', '')).split('|'):
+        cert_file = cert_file.strip()
+        if cert_file:
+            referenced_files.append(os.path.join(CERT_DIR, cert_file))
+    for path in referenced_files:
+        digest.update(f"{os.path.basename(path)}:{file_hash(path)}\x1f".encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def load_manifest(engine, manifest_table):
+    with engine.connect() as conn:
+        rows = conn.execute(select(manifest_table.c.property_id, manifest_table.c.fingerprint))
+        return {property_id: fingerprint for property_id, fingerprint in rows}
+
+
+def diff_manifest(previous, current):
+    """Returns (new, changed, deleted) property_id sets."""
+    new = {prop_id for prop_id in current if prop_id not in previous}
+    changed = {prop_id for prop_id in current if prop_id in previous and previous[prop_id] != current[prop_id]}
+    deleted = set(previous) - set(current)
+    return new, changed, deleted
+
+
+def delete_qdrant_points(qdrant_client, property_ids):
+    if not property_ids:
         return
-        
-    print(f"Loaded {len(df)} properties from Excel.")
-
-    print("Cleaning data... Replacing NaN with defaults.")
-    df['title'] = df['title'].fillna('') 
-    df['long_description'] = df['long_description'].fillna('')
-    df['certificates'] = df['certificates'].fillna('')
-    df['price'] = df['price'].fillna(0.0)
-    
-    qdrant_points = [] 
-    
-    print("Processing properties...")
-    for _, row in tqdm(df.iterrows(), total=df.shape[0], desc="Properties"):
+    qdrant_client.delete(
+        collection_name=QDRANT_COLLECTION,
+        points_selector=models.FilterSelector(
+            filter=models.Filter(
+                must=[models.FieldCondition(key="property_id", match=models.MatchAny(any=list(property_ids)))]
+            )
+        ),
+        wait=True
+    )
+
+
+def delete_stale_qdrant_points(qdrant_client, current_point_ids, chunk_size=QDRANT_DELETE_CHUNK_SIZE):
+    """
+    current_point_ids maps re-ingested property IDs to the point IDs just
+    uploaded for them. Every other point of those properties is left over
+    from their previous version (e.g. a certificate that was removed) and
+    is deleted. Point IDs are derived from the property ID, so one
+    property's new IDs never match another property's points.
+    """
+    property_ids = list(current_point_ids)
+    for start in range(0, len(property_ids), chunk_size):
+        chunk = property_ids[start:start + chunk_size]
+        qdrant_client.delete(
+            collection_name=QDRANT_COLLECTION,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[models.FieldCondition(key="property_id", match=models.MatchAny(any=chunk))],
+                    must_not=[models.HasIdCondition(
+                        has_id=[point_id for prop_id in chunk for point_id in current_point_ids[prop_id]]
+                    )]
+                )
+            ),
+            wait=True
+        )
+
+
+def _parse_with_inference_server(image_paths):
+    # The API's worker processes already hold the detector; parsing here
+    # would load a second copy of it into the API process.
+    futures = [inference_server.submit(path) for path in image_paths]
+    outputs = []
+    for future in futures:
+        try:
+            outputs.append(future.result(timeout=inference_server.request_timeout))
+        except Exception as e:
+            outputs.append(json.dumps({"error": f"Inference worker failed: {e!r}"}))
+    return outputs
+
+
+def parse_batch_floorplans(batch_df):
+    # Run the detector over the batch's floorplans in one go instead of
+    # one forward pass per spreadsheet row.
+    image_paths = [os.path.join(IMAGE_DIR, str(image_file)) for image_file in batch_df['image_file']]
+    existing_image_paths = list(dict.fromkeys(p for p in image_paths if os.path.exists(p)))
+    if inference_server is not None and inference_server.is_running():
+        return dict(zip(existing_image_paths, _parse_with_inference_server(existing_image_paths)))
+    return dict(zip(existing_image_paths, parse_floorplans(existing_image_paths)))
+
+
+def search_payload(row, floorplan_json_string):
+    """
+    Structured fields copied onto every chunk of a property so /search
+    can filter inside Qdrant: price, lower-cased city and state, seller
+    type and, when the floorplan parsed, room counts under "rooms".
+    """
+    city, state = split_location(row.get('location'))
+    seller_type = row.get('seller_type')
+    payload = {
+        "price": float(row.get('price') or 0.0),
+        "city": city.lower() if city else None,
+        "state": state.lower() if state else None,
+        # Blank cells arrive as NaN, which is not valid JSON.
+        "seller_type": seller_type if isinstance(seller_type, str) else None,
+    }
+    rooms = room_counts(floorplan_json_string)
+    if rooms is not None:
+        payload["rooms"] = rooms
+    return payload
+
+
+def _optional_str(value):
+    return None if value is None else str(value)
+
+
+def transform_batch(batch_df, floorplan_results, embedding_engine, certificate_store):
+    """
+    Turns a slice of spreadsheet rows into MySQL records, embedded chunks
+    and per-row error messages. Chunks are (point_id, payload, embedding).
+    Text from every row in the slice is embedded in a single call.
+    """
+    cert_paths = [
+        os.path.join(CERT_DIR, cert_file.strip())
+        for certificates in batch_df['certificates']
+        for cert_file in str(certificates).split('|')
+        if cert_file.strip()
+    ]
+    certificate_ids = certificate_store.resolve(cert_paths)
+
+    property_records = []
+    pending_chunks = []
+    errors = []
+    # Plain dicts rather than iterrows(), which boxes every row into a Series.
+    for row in batch_df.to_dict('records'):
         try:
             prop_id = str(row['property_id'])
             
             image_file_name = row['image_file']
-            image_full_path = os.path.join(IMAGE_DIR, image_file_name)
+            image_full_path = os.path.join(IMAGE_DIR, str(image_file_name))
             
-            if not os.path.exists(image_full_path):
+            if image_full_path not in floorplan_results:
                 floorplan_json_string = json.dumps({"error": "image_file_not_found"})
             else:
-                floorplan_json_string = parse_floorplan(image_full_path)
+                floorplan_json_string = floorplan_results[image_full_path]
 
             property_record = {
                 'property_id': prop_id,
@@ -164,87 +513,309 @@ def run_etl():
                 'location': row.get('location'),
                 'price': row.get('price'),
                 'seller_type': row.get('seller_type'),
-                'listing_date': str(row.get('listing_date')),
+                'listing_date': _optional_str(row.get('listing_date')),
                 'certificates': row.get('certificates'),
-                'seller_contact': str(row.get('seller_contact')),
+                'seller_contact': _optional_str(row.get('seller_contact')),
                 'metadata_tags': row.get('metadata_tags'),
-                'floorplan_data': floorplan_json_string
-            }
-            
-            # --- THIS IS THE FIX ---
-            # Create the insert statement
-            stmt = mysql_insert(properties_table).values(property_record)
-
-            # Create the 'on duplicate' update dictionary
-            # This uses .inserted (for MySQL) instead of .excluded (for Postgres)
-            update_on_conflict = {
-                c.name: stmt.inserted[c.name]
-                for c in properties_table.columns
-                if c.name not in ["id", "property_id"] # Don't update keys
+                'floorplan_data': floorplan_json_string,
+                **structured_values(row.get('location'), row.get('listing_date'), floorplan_json_string)
             }
 
-            # Apply the on_duplicate_key_update
-            stmt = stmt.on_duplicate_key_update(**update_on_conflict)
-            # --- END OF FIX ---
-
-            db_session.execute(stmt)
-
-            # ... (rest of the Qdrant and PDF logic is unchanged) ...
-            text_chunks = []
+            filters = search_payload(row, floorplan_json_string)
             desc_text = f"Title: {row.get('title', '')}. Description: {row.get('long_description', '')}"
-            text_chunks.append(desc_text)
+            pending_chunks.append((
+                point_id_for(prop_id, "description", 0),
+                {"text": desc_text, "property_id": prop_id, "chunk_type": "description", **filters},
+                desc_text
+            ))
             
-            pdf_text = ""
+            # One chunk per certificate. The payload points at the shared
+            # certificate text by ID rather than carrying a copy of it.
             cert_files = str(row.get('certificates', '')).split('|') 
             for cert_file in cert_files:
                 cert_file = cert_file.strip()
-                if cert_file:
-                    cert_full_path = os.path.join(CERT_DIR, cert_file)
-                    if os.path.exists(cert_full_path):
-                        pdf_text += extract_text_from_pdf(cert_full_path) + " "
-            
-            if pdf_text:
-                text_chunks.append(pdf_text)
-            
-            embeddings = embedding_model.encode(text_chunks)
-            
-            for i, (text_chunk, embedding) in enumerate(zip(text_chunks, embeddings)):
-                qdrant_points.append(
-                    models.PointStruct(
-                        id=str(uuid.uuid4()),
-                        vector=embedding.tolist(),
-                        payload={
-                            "text": text_chunk,
+                certificate_id = certificate_ids.get(os.path.join(CERT_DIR, cert_file)) if cert_file else None
+                cert_text = certificate_store.get_text(certificate_id) if certificate_id else ""
+                if cert_text:
+                    pending_chunks.append((
+                        point_id_for(prop_id, "certificate", certificate_id),
+                        {
                             "property_id": prop_id,
-                            "chunk_type": "description" if i == 0 else "certificate"
-                        }
-                    )
-                )
+                            "chunk_type": "certificate",
+                            "certificate_id": certificate_id,
+                            "certificate_file": cert_file,
+                            **filters
+                        },
+                        cert_text
+                    ))
+
+            property_records.append(property_record)
 
         except Exception as e:
             print(f"Error processing property {row.get('property_id')}: {e}")
-            db_session.rollback()
+            errors.append(f"Property {row.get('property_id')}: {e}")
             continue
-            
-    
+
+    embeddings = embedding_engine.encode([text for _, _, text in pending_chunks])
+    chunks = [(point_id, payload, embedding) for (point_id, payload, _), embedding in zip(pending_chunks, embeddings)]
+    return property_records, chunks, errors
+
+
+def run_etl(excel_path=EXCEL_PATH, full_refresh=False, job=None):
+    """
+    Incremental by default: only properties whose row or referenced files
+    changed since the last run are re-parsed, re-embedded and re-upserted,
+    and properties missing from the spreadsheet are removed. Pass
+    full_refresh=True to rebuild the Qdrant collection from scratch; an
+    empty manifest does the same.
+
+    excel_path may be an .xlsx, .csv or .parquet file. It is streamed in
+    batches, so changed rows reach the pipeline while the rest of the
+    file is still being read.
+
+    `job` is an optional job_manager.IngestJob that receives progress and
+    errors and can cancel the run between batches. Returns a summary dict.
+    """
+    print("\n--- Starting: ETL Process ---")
+
+    if not os.path.exists(excel_path):
+        print(f"Fatal Error: Property file not found at {excel_path}")
+        raise FileNotFoundError(excel_path)
+
+    mysql_engine, db_session = get_db_session()
+    properties_table, manifest_table = setup_mysql_table(mysql_engine)
+    previous_fingerprints = load_manifest(mysql_engine, manifest_table)
+    if not previous_fingerprints and not full_refresh:
+        # Nothing is tracked yet, so every row is rewritten anyway. Points
+        # from before deterministic IDs (or the manifest) would otherwise
+        # stay next to their replacements, so start from an empty collection.
+        print("Ingest manifest is empty, rebuilding the Qdrant collection...")
+        full_refresh = True
+    qdrant_client = get_qdrant_client_instance(recreate=full_refresh)
+    embedding_engine = EmbeddingEngine(load_embedding_model(), EMBEDDING_MODEL_NAME)
+    certificate_store = CertificateStore()
+
+    file_hashes = {}
+    def file_hash(path):
+        if path not in file_hashes:
+            file_hashes[path] = sha256_file(path) if os.path.isfile(path) else None
+        return file_hashes[path]
+
+    fingerprints = {}
+    duplicate_rows = 0
+    rows_selected = 0
+    rows_scanned = 0
+    rows_failed = 0
+    unreported_rows = 0
+    # Stage workers report dropped batches from their own threads.
+    progress_lock = threading.Lock()
+
+    rows_estimate = count_rows(excel_path)
+    if job is not None:
+        job.set_total(rows_estimate or 0)
+
+    uploader = QdrantStreamUploader(qdrant_client, QDRANT_COLLECTION, EMBEDDING_DIMENSION)
+    processed_ids = []
+    # Changed properties keep their old points until the new ones are uploaded.
+    changed_point_ids = {}
+    progress = tqdm(total=rows_estimate, desc="Properties")
+
+    def report_scanned(rows):
+        nonlocal rows_scanned
+        with progress_lock:
+            rows_scanned += rows
+            progress.update(rows)
+            if job is not None:
+                job.update_progress(rows_scanned)
+
+    def report_failed_batch(stage_name, batch, error):
+        # A dropped batch still counts as read, and its rows are retried on the next ingest.
+        nonlocal rows_failed
+        failed_ids = [str(prop_id) for prop_id in batch["df"]['property_id']]
+        with progress_lock:
+            rows_failed += len(failed_ids)
+        report_scanned(batch["scanned"])
+        if job is not None:
+            shown = ", ".join(failed_ids[:20]) + (", ..." if len(failed_ids) > 20 else "")
+            job.add_error(f"Stage '{stage_name}' failed on {len(failed_ids)} rows ({shown}): {error}")
+
+    # Each stage works on one ETL_BATCH_SIZE slice at a time, so the
+    # detector, embedding model, MySQL writes and Qdrant uploads of
+    # different slices overlap instead of running back to back.
+    def floorplan_stage(batch):
+        batch["floorplans"] = parse_batch_floorplans(batch["df"])
+        return batch
+
+    def transform_stage(batch):
+        batch["records"], batch["chunks"], errors = transform_batch(
+            batch["df"], batch["floorplans"], embedding_engine, certificate_store
+        )
+        if job is not None:
+            for error in errors:
+                job.add_error(error)
+        return batch
+
+    def mysql_stage(batch):
+        failed_records = bulk_upsert(mysql_engine, properties_table, batch["records"])
+        batch["failed_ids"] = {record['property_id'] for record in failed_records}
+        if job is not None and failed_records:
+            failed_ids = ", ".join(str(record['property_id']) for record in failed_records)
+            job.add_error(f"{len(failed_records)} rows could not be written to MySQL: {failed_ids}")
+        return batch
+
+    def qdrant_stage(batch):
+        # Points stream out in fixed-size batches while later slices are processed.
+        batch_point_ids = {}
+        for point_id, payload, embedding in batch["chunks"]:
+            if payload["property_id"] not in batch["failed_ids"]:
+                uploader.add(point_id, embedding, payload)
+                batch_point_ids.setdefault(payload["property_id"], []).append(point_id)
+        for prop_id, point_ids in batch_point_ids.items():
+            # A later row for the same property replaces the points of an earlier one.
+            if prop_id in changed_point_ids:
+                changed_point_ids[prop_id] = point_ids
+        processed_ids.extend(
+            record['property_id'] for record in batch["records"] if record['property_id'] not in batch["failed_ids"]
+        )
+        report_scanned(batch["scanned"])
+        return batch
+
+    pipeline = Pipeline([
+        Stage("floorplans", floorplan_stage),
+        Stage("transform", transform_stage),
+        Stage("mysql", mysql_stage, workers=ETL_MYSQL_WORKERS),
+        Stage("qdrant", qdrant_stage),
+    ], on_error=report_failed_batch)
+
+    def select_rows(df):
+        """Fingerprints a read batch and returns the rows that need processing."""
+        nonlocal duplicate_rows
+        batch_fingerprints = [fingerprint_row(row, file_hash) for row in df.to_dict('records')]
+        selected = []
+        for prop_id, fingerprint in zip(df['property_id'], batch_fingerprints):
+            if prop_id in fingerprints:
+                # A later row for the same property wins, as before.
+                duplicate_rows += 1
+            fingerprints[prop_id] = fingerprint
+            previous = previous_fingerprints.get(prop_id)
+            if previous is not None and previous != fingerprint and not full_refresh:
+                changed_point_ids.setdefault(str(prop_id), [])
+            selected.append(full_refresh or previous != fingerprint)
+        return df[selected]
+
+    def take_unreported():
+        # Read rows are credited to progress once the batch after them is done.
+        nonlocal unreported_rows
+        scanned, unreported_rows = unreported_rows, 0
+        return scanned
+
+    def batches():
+        nonlocal unreported_rows, rows_selected
+        pending = []
+        pending_rows = 0
+        for df in iter_row_batches(excel_path):
+            if job is not None and job.is_cancelled():
+                print("Ingest cancelled, finishing batches already in flight...")
+                return
+            rows_without_id = df.attrs.get('rows_without_id', 0)
+            unreported_rows += len(df) + rows_without_id
+            if rows_without_id:
+                print(f"Skipped {rows_without_id} rows without a property_id.")
+                if job is not None:
+                    job.add_error(f"Skipped {rows_without_id} rows without a property_id.")
+            selected = select_rows(df)
+            if selected.empty:
+                continue
+            rows_selected += len(selected)
+            pending.append(selected)
+            pending_rows += len(selected)
+            # Re-slice so stages always see ETL_BATCH_SIZE rows, whatever the read batch size.
+            while pending_rows >= ETL_BATCH_SIZE:
+                buffer = pd.concat(pending, ignore_index=True)
+                yield {"df": buffer.iloc[:ETL_BATCH_SIZE], "scanned": take_unreported()}
+                pending = [buffer.iloc[ETL_BATCH_SIZE:]]
+                pending_rows -= ETL_BATCH_SIZE
+        if pending_rows:
+            yield {"df": pd.concat(pending, ignore_index=True), "scanned": take_unreported()}
+
+    print("Processing properties...")
+    try:
+        pipeline_stats = pipeline.run(batches())
+    finally:
+        # Waits for the last uploads and stops the upload threads, which
+        # would otherwise outlive a failed run in the job worker process.
+        upload_stats = uploader.close()
+    cancelled = job is not None and job.is_cancelled()
+    # Unchanged rows after the last processed batch.
+    report_scanned(take_unreported())
+    progress.close()
+
+    new_ids, changed_ids, deleted_ids = diff_manifest(previous_fingerprints, fingerprints)
+    if cancelled:
+        # Rows never read are not missing from the file, so nothing is deleted.
+        deleted_ids = set()
+    print(f"Diff: {len(new_ids)} new, {len(changed_ids)} changed, {len(deleted_ids)} deleted, "
+          f"{len(fingerprints) - len(new_ids) - len(changed_ids)} unchanged, {duplicate_rows} duplicate rows.")
+    for stage_name, stage_stats in pipeline_stats["stages"].items():
+        print(f"Stage '{stage_name}': {stage_stats['processed']} batches, "
+              f"{stage_stats['items_per_second']:.2f} batches/s, "
+              f"{stage_stats['utilization']:.0%} busy, max queue depth {stage_stats['max_queue_depth']}.")
+
+    print(f"Uploaded {upload_stats['points']} text chunks to Local Qdrant in {upload_stats['batches']} batches "
+          f"({upload_stats['failed_batches']} failed).")
+    embedding_stats = embedding_engine.get_stats()
+    print(f"Embedded {embedding_stats['texts']} text chunks: {embedding_stats['unique_texts']} unique, "
+          f"{embedding_stats['cache_hits']} from cache, {embedding_stats['encoded']} encoded.")
+    failed_upload_ids = {payload["property_id"] for payload in uploader.failed_payloads}
+    processed_ids = [prop_id for prop_id in processed_ids if prop_id not in failed_upload_ids]
+
+    # Changed properties may have fewer chunks than before. Their leftover
+    # points are only removed once the replacements are in, so a property
+    # that failed anywhere keeps its old points and stays searchable.
+    stale_point_owners = {
+        prop_id: changed_point_ids[prop_id] for prop_id in processed_ids if changed_point_ids.get(prop_id)
+    }
+    if stale_point_owners:
+        print(f"Removing stale points of {len(stale_point_owners)} changed properties...")
+        delete_stale_qdrant_points(qdrant_client, stale_point_owners)
+
+    if deleted_ids and not cancelled:
+        print(f"Removing {len(deleted_ids)} properties no longer in the spreadsheet...")
+        db_session.execute(delete(properties_table).where(properties_table.c.property_id.in_(deleted_ids)))
+        db_session.execute(delete(manifest_table).where(manifest_table.c.property_id.in_(deleted_ids)))
+        delete_qdrant_points(qdrant_client, deleted_ids)
+
     try:
         db_session.commit()
         print("Successfully saved all structured data to Local MySQL.")
     except Exception as e:
         print(f"Error committing to MySQL: {e}")
         db_session.rollback()
-        
-    if qdrant_points:
-        print(f"Uploading {len(qdrant_points)} text chunks to Local Qdrant...")
-        qdrant_client.upsert(
-            collection_name=QDRANT_COLLECTION,
-            points=qdrant_points,
-            wait=True
-        )
-        print("Successfully uploaded all unstructured data to Local Qdrant.")
+
+    # Only record fingerprints once both stores hold the property, so a
+    # failed run is retried on the next ingest.
+    bulk_upsert(
+        mysql_engine,
+        manifest_table,
+        [{'property_id': prop_id, 'fingerprint': fingerprints[prop_id]} for prop_id in processed_ids],
+        key_columns=("property_id",)
+    )
 
     db_session.close()
+    if processed_ids or (deleted_ids and not cancelled):
+        # Cached /chat answers about the old rows are now stale.
+        version = bump_table_version(mysql_engine, DB_TABLE_NAME)
+        print(f"Table '{DB_TABLE_NAME}' is now at version {version}.")
     print("\n--- ETL Process Finished ---")
+    return {
+        "rows_total": len(fingerprints),
+        "rows_selected": rows_selected,
+        "rows_processed": len(processed_ids),
+        "rows_failed": rows_failed,
+        "rows_deleted": 0 if cancelled else len(deleted_ids),
+        "cancelled": cancelled,
+        "pipeline": pipeline_stats,
+    }
 
 if __name__ == "__main__":
     if not os.path.exists(EXCEL_PATH):
@@ -0,0 +1,270 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from sqlalchemy import MetaData, Table, Column, String, Float, Integer, TEXT, select, update, insert
+
+JOBS_TABLE_NAME = "ingest_jobs"
+MAX_STORED_ERRORS = 50
+
+jobs_metadata = MetaData()
+jobs_table = Table(
+    JOBS_TABLE_NAME,
+    jobs_metadata,
+    Column('job_id', String(36), primary_key=True),
+    Column('status', String(32), nullable=False),
+    Column('file_path', String(1024)),
+    Column('created_at', Float),
+    Column('started_at', Float),
+    Column('finished_at', Float),
+    Column('rows_total', Integer, default=0),
+    Column('rows_processed', Integer, default=0),
+    Column('errors', TEXT),
+    Column('message', String(1024)),
+)
+
+
+class IngestJob:
+    """Handle passed to run_etl so it can report progress and check for cancellation."""
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+        self.cancel_event = threading.Event()
+        self.errors = []
+        # Pipeline stage threads report concurrently; one lock orders their writes.
+        self._lock = threading.Lock()
+
+    def set_total(self, rows_total):
+        with self._lock:
+            self.manager._update(self.job_id, rows_total=rows_total)
+
+    def update_progress(self, rows_processed):
+        with self._lock:
+            self.manager._update(self.job_id, rows_processed=rows_processed)
+
+    def add_error(self, message):
+        with self._lock:
+            if len(self.errors) < MAX_STORED_ERRORS:
+                self.errors.append(message)
+                self.manager._update(self.job_id, errors=json.dumps(self.errors))
+
+    def record_failure(self, message):
+        # The reason a job failed is always kept, even past MAX_STORED_ERRORS.
+        with self._lock:
+            self.errors.append(message)
+
+    def errors_json(self):
+        with self._lock:
+            return json.dumps(self.errors)
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+
+class IngestJobManager:
+    """
+    Runs ingests one at a time on a background thread and keeps their
+    state in MySQL. While a job is running, at most one more waits in the
+    queue: a newer upload supersedes a queued one, since running both
+    would only re-ingest the older file first.
+    """
+
+    def __init__(self, etl_func, engine_factory, upload_dir=None):
+        self.etl_func = etl_func
+        self.engine_factory = engine_factory
+        self.upload_dir = upload_dir
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending_job_id = None
+        self._active = {}
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            # submit() may race the lifespan start, or another submit.
+            if self._thread is not None:
+                return
+            self._start()
+
+    def _start(self):
+        engine = self.engine_factory()
+        jobs_metadata.create_all(engine)
+        with engine.begin() as conn:
+            # A job that was running when the process stopped cannot resume.
+            interrupted_files = conn.execute(
+                select(jobs_table.c.file_path).where(jobs_table.c.status == "running")
+            ).scalars().all()
+            conn.execute(
+                update(jobs_table)
+                .where(jobs_table.c.status == "running")
+                .values(status="failed", finished_at=time.time(), message="Interrupted by a server restart.")
+            )
+            queued = conn.execute(
+                select(jobs_table.c.job_id)
+                .where(jobs_table.c.status == "queued")
+                .order_by(jobs_table.c.created_at)
+            ).fetchall()
+        for file_path in interrupted_files:
+            self._discard_upload(file_path)
+        for (job_id,) in queued:
+            self._enqueue(job_id)
+
+        self._thread = threading.Thread(target=self._run, name="ingest-jobs", daemon=True)
+        self._thread.start()
+
+    def _discard_upload(self, file_path):
+        # Uploaded spreadsheets are only needed until their job reaches a final status.
+        if not file_path or not self.upload_dir:
+            return
+        if os.path.dirname(os.path.abspath(file_path)) != os.path.abspath(self.upload_dir):
+            return
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not delete upload {file_path}: {e!r}")
+
+    def _file_path(self, job_id):
+        with self.engine_factory().connect() as conn:
+            return conn.execute(select(jobs_table.c.file_path).where(jobs_table.c.job_id == job_id)).scalar()
+
+    def _update(self, job_id, **values):
+        with self.engine_factory().begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.job_id == job_id).values(**values))
+
+    def _enqueue(self, job_id):
+        with self._lock:
+            if self._pending_job_id is not None:
+                self._update(
+                    self._pending_job_id,
+                    status="superseded",
+                    finished_at=time.time(),
+                    message=f"Superseded by job {job_id}."
+                )
+                self._discard_upload(self._file_path(self._pending_job_id))
+            self._pending_job_id = job_id
+            self._active[job_id] = IngestJob(self, job_id)
+        self._queue.put(job_id)
+
+    def submit(self, file_path):
+        if self._thread is None:
+            # MySQL may not have been reachable when the API started.
+            self.start()
+        job_id = str(uuid.uuid4())
+        with self.engine_factory().begin() as conn:
+            conn.execute(insert(jobs_table).values(
+                job_id=job_id,
+                status="queued",
+                file_path=file_path,
+                created_at=time.time(),
+                rows_total=0,
+                rows_processed=0,
+                errors="[]"
+            ))
+        self._enqueue(job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._active.get(job_id)
+            if job is None:
+                return False
+            job.cancel_event.set()
+            if self._pending_job_id == job_id:
+                self._pending_job_id = None
+                self._update(job_id, status="cancelled", finished_at=time.time(), message="Cancelled before start.")
+                self._discard_upload(self._file_path(job_id))
+        return True
+
+    def get(self, job_id):
+        with self.engine_factory().connect() as conn:
+            row = conn.execute(select(jobs_table).where(jobs_table.c.job_id == job_id)).mappings().first()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job["errors"] = json.loads(job["errors"] or "[]")
+        throughput = 0.0
+        eta_seconds = None
+        if job["started_at"]:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+            throughput = job["rows_processed"] / elapsed if elapsed > 0 else 0.0
+            # CSV uploads have no row count up front, so rows_total stays 0.
+            if job["status"] == "running" and throughput > 0 and job["rows_total"] > job["rows_processed"]:
+                eta_seconds = (job["rows_total"] - job["rows_processed"]) / throughput
+        job["rows_per_second"] = throughput
+        job["eta_seconds"] = eta_seconds
+        return job
+
+    def _run(self):
+        # This is the only worker thread: nothing may escape the loop, or
+        # every later job would stay queued forever.
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run_one(job_id)
+            except (Exception, SystemExit) as e:
+                print(f"Ingest job {job_id} crashed the worker loop: {e!r}")
+                with self._lock:
+                    self._active.pop(job_id, None)
+                try:
+                    self._update(job_id, status="failed", finished_at=time.time(),
+                                 message=f"Ingest failed: {e!r}"[:1024])
+                    self._discard_upload(self._file_path(job_id))
+                except Exception as update_error:
+                    print(f"Could not mark ingest job {job_id} as failed: {update_error!r}")
+
+    def _run_one(self, job_id):
+        with self._lock:
+            if self._pending_job_id == job_id:
+                self._pending_job_id = None
+            job = self._active.get(job_id)
+        state = self.get(job_id)
+        # Superseded and cancelled-while-queued jobs are skipped.
+        if job is None or job.is_cancelled() or state is None or state["status"] != "queued":
+            with self._lock:
+                self._active.pop(job_id, None)
+            if state is not None:
+                if state["status"] == "queued":
+                    # Cancelled after it left the queue but before it started.
+                    self._update(job_id, status="cancelled", finished_at=time.time(), message="Cancelled before start.")
+                self._discard_upload(state["file_path"])
+            return
+        self._execute(job, state["file_path"])
+
+    def _execute(self, job, file_path):
+        print(f"Starting ingest job {job.job_id} for {file_path}...")
+        try:
+            self._update(job.job_id, status="running", started_at=time.time())
+            summary = self.etl_func(excel_path=file_path, job=job)
+            status = "cancelled" if summary["cancelled"] else "completed"
+            message = (f"Read {summary['rows_total']} rows; processed {summary['rows_processed']} of "
+                       f"{summary['rows_selected']} new or changed, removed {summary['rows_deleted']}.")
+            if summary.get("rows_failed"):
+                message += f" {summary['rows_failed']} rows failed and will be retried on the next ingest."
+        except (Exception, SystemExit) as e:
+            # run_etl calls sys.exit() on connection failures; keep the worker alive.
+            status = "failed"
+            message = f"Ingest failed: {e!r}"
+            job.record_failure(message)
+        finally:
+            with self._lock:
+                self._active.pop(job.job_id, None)
+
+        try:
+            self._update(
+                job.job_id,
+                status=status,
+                finished_at=time.time(),
+                message=message[:1024],
+                errors=job.errors_json()
+            )
+            print(f"Ingest job {job.job_id} finished: {status}.")
+        finally:
+            self._discard_upload(file_path)
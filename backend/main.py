@@ -1,69 +1,346 @@
-from fastapi import FastAPI, File, UploadFile, BackgroundTasks
+from typing import Dict, List, Optional
+from fastapi import FastAPI, File, UploadFile, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 import os
-import shutil
 import json
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
 
 # Import your existing logic
-from agent import sql_agent
-from ingest_logic import run_etl
-from inference_logic import parse_floorplan
+from agent import sql_agent, generated_sql, query_guard
+from fast_agent import FastSQLAgent, agent_events
+from query_cache import query_cache
+from ingest_logic import run_etl, get_db_engine
+from job_manager import IngestJobManager
+from inference_logic import (
+    parse_floorplan, parse_floorplans, model_registry, result_cache, warmup_models, get_tier_stats,
+    resolve_weights_path, resolve_model_path, MODEL_WEIGHTS_DIR
+)
+from concurrency import WorkQueueTimeout, chat_limiter, run_inference, save_upload
+from inference_server import inference_server
+from spreadsheet_reader import SUPPORTED_EXTENSIONS
+from query_guard import agent_question
+from search_logic import property_search, SEARCH_DEFAULT_LIMIT
+from db import get_pool_stats
 
-app = FastAPI(title="SmartSense API")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/app/assets/uploads")
+
+job_manager = IngestJobManager(run_etl, get_db_engine, upload_dir=UPLOAD_DIR)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm the floorplan model once, before the first request.
+    # With an inference server, only its worker processes hold the model.
+    if inference_server is not None:
+        inference_server.start()
+    else:
+        try:
+            warmup_models()
+        except Exception as e:
+            print(f"Floorplan model warmup failed: {e}")
+    try:
+        job_manager.start()
+    except Exception as e:
+        print(f"Ingest job manager failed to start: {e}")
+    yield
+    if inference_server is not None:
+        inference_server.shutdown()
+
+app = FastAPI(title="SmartSense API", lifespan=lifespan)
+
+@app.exception_handler(WorkQueueTimeout)
+async def work_queue_timeout_handler(request: Request, exc: WorkQueueTimeout):
+    return JSONResponse(status_code=503, content={"error": str(exc)})
 
 # --- Model for the /chat endpoint ---
 class ChatRequest(BaseModel):
     message: str
     user_id: str = "local"
 
+async def cached_answer(message):
+    """Returns (table_version, cached answer or None). Repeat questions skip the LLM until the next ingest."""
+    if query_cache is None:
+        return None, None
+    version = await asyncio.to_thread(query_cache.current_version)
+    return version, query_cache.get_answer(message, version)
+
+def remember_answer(message, sql, answer, version):
+    # Only answers backed by a query that actually ran are worth repeating.
+    if query_cache is not None and sql and answer:
+        query_cache.put_answer(message, sql, answer, version)
+
 # --- 1. /chat endpoint (Your existing logic) ---
 @app.post("/chat")
 async def handle_chat(request: ChatRequest):
     if not sql_agent:
         return {"error": "Agent not initialized."}
     try:
-        response = sql_agent.invoke({"input": request.message})
-        return {"response": response.get("output", "Sorry, I couldn't find an answer.")}
+        version, cached = await cached_answer(request.message)
+        if cached is not None:
+            return {"response": cached["answer"], "sql": cached["sql"], "cached": True}
+
+        # ainvoke keeps the event loop free while the agent waits on Groq and MySQL.
+        agent_question.set(request.message)
+        async with chat_limiter.slot():
+            response = await sql_agent.ainvoke({"input": request.message})
+        answer = response.get("output", "Sorry, I couldn't find an answer.")
+        sql = generated_sql(response)
+        remember_answer(request.message, sql, response.get("output"), version)
+        return {"response": answer, "sql": sql, "cached": False, "path": response.get("path", "agent")}
+    except WorkQueueTimeout:
+        raise
     except Exception as e:
         return {"response": f"An error occurred: {e}"}
 
-# --- 2. /ingest endpoint (NEW) ---
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# --- 1b. /chat/stream endpoint (Server-Sent Events) ---
+@app.post("/chat/stream")
+async def handle_chat_stream(request: ChatRequest):
+    """
+    Streams the answer as Server-Sent Events: "sql" once the query is
+    written, "rows" once it has run, "token" for each piece of the answer,
+    "fallback" if the fast path hands over to the ReAct agent, then "done"
+    with the full response (or "error").
+    """
+    if not sql_agent:
+        return {"error": "Agent not initialized."}
+
+    async def events():
+        try:
+            version, cached = await cached_answer(request.message)
+            if cached is not None:
+                yield sse_event("sql", {"sql": cached["sql"]})
+                yield sse_event("token", {"text": cached["answer"]})
+                yield sse_event("done", {"response": cached["answer"], "sql": cached["sql"], "cached": True})
+                return
+
+            inputs = {"input": request.message}
+            agent_question.set(request.message)
+            answer = None
+            async with chat_limiter.slot():
+                if isinstance(sql_agent, FastSQLAgent):
+                    stream = sql_agent.astream(inputs)
+                else:
+                    stream = agent_events(sql_agent, inputs)
+                async for event, data in stream:
+                    if event == "answer":
+                        answer = data
+                    else:
+                        yield sse_event(event, data)
+
+            if answer is None or answer["output"] is None:
+                yield sse_event("error", {"error": "Sorry, I couldn't find an answer."})
+                return
+            remember_answer(request.message, answer["sql"], answer["output"], version)
+            yield sse_event("done", {
+                "response": answer["output"], "sql": answer["sql"], "cached": False, "path": answer["path"]
+            })
+        except Exception as e:
+            # Headers are already sent, so errors (including a full chat queue) become events.
+            yield sse_event("error", {"error": f"An error occurred: {e}"})
+
+    # X-Accel-Buffering stops a reverse proxy from holding events back.
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/chat/stats")
+def chat_stats():
+    guard = query_guard.get_stats() if query_guard is not None else None
+    if not isinstance(sql_agent, FastSQLAgent):
+        return {"mode": "agent", "query_guard": guard}
+    return {"mode": "fast", **sql_agent.get_stats(), "query_guard": guard}
+
+@app.get("/chat/cache")
+def chat_cache_stats():
+    if query_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **query_cache.get_stats()}
+
+# --- 1c. /search endpoint (no LLM) ---
+class SearchRequest(BaseModel):
+    query: str
+    limit: int = SEARCH_DEFAULT_LIMIT
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    seller_type: Optional[str] = None
+    # Room type (e.g. "bedroom") -> minimum / maximum count.
+    min_rooms: Optional[Dict[str, int]] = None
+    max_rooms: Optional[Dict[str, int]] = None
+
+@app.post("/search")
+async def handle_search(request: SearchRequest):
+    """
+    Semantic search over descriptions and certificates, filtered on
+    price, location and room counts. Constraints in the query text
+    ("3 BHK in Pune under 80L") are applied too; fields set in the
+    request take precedence over them.
+    """
+    filters = {
+        "min_price": request.min_price,
+        "max_price": request.max_price,
+        "cities": [request.city.lower()] if request.city else None,
+        "states": [request.state.lower()] if request.state else None,
+        "seller_type": request.seller_type,
+        "min_rooms": request.min_rooms,
+        "max_rooms": request.max_rooms,
+    }
+    try:
+        return await asyncio.to_thread(property_search.search, request.query, filters, request.limit)
+    except Exception as e:
+        return {"error": f"Search failed: {e}"}
+
+@app.get("/search/stats")
+def search_stats():
+    return property_search.get_stats()
+
+# --- 2. /ingest endpoints ---
 @app.post("/ingest")
-async def trigger_ingest(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    # Save the uploaded Excel file temporarily
-    temp_file_path = f"/app/assets/{file.filename}"
-    with open(temp_file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+async def trigger_ingest(file: UploadFile = File(...)):
+    if os.path.splitext(file.filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+        return {"error": f"Unsupported file type; upload one of {', '.join(SUPPORTED_EXTENSIONS)}."}
+
+    # Save the uploaded property file until its job has run
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    temp_file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}")
+    await save_upload(file, temp_file_path)
     
-    # Run the ETL process in the background
-    # This immediately returns a "success" message to the user
-    # so the frontend doesn't time out.
-    print(f"Starting background ETL for {file.filename}...")
-    background_tasks.add_task(run_etl)
+    # Ingests run one at a time on the job manager's worker thread, so
+    # this returns immediately with an ID the frontend can poll.
+    try:
+        # submit writes the job row to MySQL; keep that off the event loop.
+        job_id = await asyncio.to_thread(job_manager.submit, temp_file_path)
+    except Exception as e:
+        os.remove(temp_file_path)
+        return {"error": f"Could not queue ingest: {e}"}
+    print(f"Queued ingest job {job_id} for {file.filename}...")
     
-    return {"message": "File upload successful. Ingestion started in the background."}
+    return {"message": "File upload successful. Ingestion queued.", "job_id": job_id}
+
+@app.get("/ingest/{job_id}")
+def ingest_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return {"error": f"Unknown job {job_id}"}
+    return job
+
+@app.post("/ingest/{job_id}/cancel")
+def cancel_ingest(job_id: str):
+    if not job_manager.cancel(job_id):
+        return {"error": f"Job {job_id} is not queued or running."}
+    return {"message": f"Cancellation requested for job {job_id}."}
+
+async def parse_uploaded_floorplans(image_paths):
+    if inference_server is None:
+        return await run_inference(parse_floorplans, image_paths)
+    # Each image is queued separately so the server can micro-batch it
+    # with images from concurrent requests.
+    try:
+        return await asyncio.gather(*(inference_server.parse(path) for path in image_paths))
+    except asyncio.TimeoutError:
+        raise WorkQueueTimeout("inference", inference_server.request_timeout)
 
 # --- 3. /parse-floorplan endpoint (NEW) ---
 @app.post("/parse-floorplan")
 async def trigger_parse(file: UploadFile = File(...)):
     # Save the uploaded image temporarily
-    temp_image_path = f"/tmp/{file.filename}"
-    with open(temp_image_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    temp_image_path = f"/tmp/{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+    await save_upload(file, temp_image_path)
     
     try:
-        # Run the floorplan parsing
-        json_string_output = parse_floorplan(temp_image_path)
-        
-        # Clean up the temp file
-        os.remove(temp_image_path)
+        # Run the floorplan parsing on the dedicated inference executor
+        if inference_server is None:
+            json_string_output = await run_inference(parse_floorplan, temp_image_path)
+        else:
+            (json_string_output,) = await parse_uploaded_floorplans([temp_image_path])
         
         # Return the raw JSON string
         return {"json_output": json.loads(json_string_output)}
+    except WorkQueueTimeout:
+        raise
     except Exception as e:
+        return {"error": str(e)}
+    finally:
+        # Clean up the temp file
         os.remove(temp_image_path)
+
+# --- 3b. /parse-floorplan/batch endpoint ---
+@app.post("/parse-floorplan/batch")
+async def trigger_parse_batch(files: List[UploadFile] = File(...)):
+    temp_image_paths = []
+    try:
+        for file in files:
+            temp_image_path = f"/tmp/{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+            temp_image_paths.append(temp_image_path)
+            await save_upload(file, temp_image_path)
+
+        json_string_outputs = await parse_uploaded_floorplans(temp_image_paths)
+        return {
+            "results": [
+                {"filename": file.filename, "json_output": json.loads(output)}
+                for file, output in zip(files, json_string_outputs)
+            ]
+        }
+    except WorkQueueTimeout:
+        raise
+    except Exception as e:
         return {"error": str(e)}
+    finally:
+        for temp_image_path in temp_image_paths:
+            if os.path.exists(temp_image_path):
+                os.remove(temp_image_path)
+
+# --- 4. Floorplan model registry ---
+class ModelReloadRequest(BaseModel):
+    model_path: str
+
+@app.get("/model/stats")
+def model_stats():
+    stats = model_registry.get_stats()
+    # With a worker pool, each worker process loaded its own copy of
+    # model_path at startup and this process runs no inference itself.
+    stats["serving"] = "inference_server" if inference_server else "api_process"
+    stats["result_cache"] = result_cache.get_stats() if result_cache else None
+    stats["tiered"] = get_tier_stats()
+    stats["inference_server"] = inference_server.get_stats() if inference_server else None
+    return stats
+
+@app.post("/model/reload")
+def reload_model(request: ModelReloadRequest):
+    if inference_server is not None:
+        # Swapping this process's registry would not reach the worker processes that serve requests.
+        return JSONResponse(status_code=409, content={
+            "error": "Model reload is not supported while the inference worker pool is running "
+                     f"(INFERENCE_WORKERS={inference_server.workers}); change MODEL_PATH and restart instead."
+        })
+    model_path = resolve_weights_path(request.model_path)
+    if model_path is not None and model_path.endswith(".pt"):
+        # Same mapping as startup, so a non-torch INFERENCE_BACKEND loads the exported model, not the checkpoint.
+        try:
+            model_path = resolve_weights_path(resolve_model_path(model_path))
+        except RuntimeError as e:
+            return {"error": str(e)}
+    if model_path is None:
+        return {"error": f"Model path must be inside the weights directory {MODEL_WEIGHTS_DIR}"}
+    if not os.path.exists(model_path):
+        return {"error": f"Model file not found at {os.path.relpath(model_path, MODEL_WEIGHTS_DIR)}"}
+    try:
+        model_registry.swap(model_path)
+        return {"message": f"Model swapped to {model_path}", "stats": model_registry.get_stats()}
+    except Exception as e:
+        return {"error": f"Error loading model: {e}"}
+
+# --- 5. Database pool ---
+@app.get("/db/stats")
+def db_stats():
+    return get_pool_stats()
 
 @app.get("/")
 def read_root():
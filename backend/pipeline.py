@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+import time
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+
+_STOP = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline: `func` is applied to every item by `workers`
+    threads reading from a bounded inbox. Its return value is passed on to
+    the next stage; returning None drops the item.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._processed = 0
+        self._failed = 0
+        self._busy_seconds = 0.0
+        self._max_queue_depth = 0
+
+    def _record(self, seconds, ok):
+        with self._lock:
+            if ok:
+                self._processed += 1
+            else:
+                self._failed += 1
+            self._busy_seconds += seconds
+            self._max_queue_depth = max(self._max_queue_depth, self.inbox.qsize())
+
+    def get_stats(self, elapsed):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "processed": self._processed,
+                "failed": self._failed,
+                "busy_seconds": round(self._busy_seconds, 3),
+                "items_per_second": self._processed / elapsed if elapsed > 0 else 0.0,
+                "utilization": self._busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0,
+                "queue_depth": self.inbox.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+            }
+
+
+class Pipeline:
+    """
+    Runs items through a list of stages concurrently. Bounded inboxes give
+    backpressure, so a slow stage throttles the ones feeding it instead of
+    letting work pile up in memory, and wall-clock time approaches that of
+    the slowest stage rather than the sum of all stages. Items a stage
+    fails on are dropped, and the failures are kept in `errors` for the
+    caller to report; `on_error(stage_name, item, exception)`, if given,
+    is also called with each dropped item from the failing worker thread.
+    """
+
+    def __init__(self, stages, on_error=None):
+        self.stages = stages
+        self.on_error = on_error
+        self.errors = []
+        self._errors_lock = threading.Lock()
+        self._started_at = None
+        self._finished_at = None
+
+    def _worker(self, index, remaining, remaining_lock):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            item = stage.inbox.get()
+            if item is _STOP:
+                break
+            start = time.perf_counter()
+            try:
+                result = stage.func(item)
+                stage._record(time.perf_counter() - start, ok=True)
+            except Exception as e:
+                print(f"Pipeline stage '{stage.name}' failed on an item: {e}")
+                stage._record(time.perf_counter() - start, ok=False)
+                with self._errors_lock:
+                    self.errors.append(f"Stage '{stage.name}' failed on a batch: {e}")
+                if self.on_error is not None:
+                    try:
+                        self.on_error(stage.name, item, e)
+                    except Exception as handler_error:
+                        print(f"Pipeline error handler failed: {handler_error}")
+                continue
+            if next_stage is not None and result is not None:
+                next_stage.inbox.put(result)
+
+        # The last worker of a stage to exit tells the next stage to stop.
+        with remaining_lock:
+            remaining[index] -= 1
+            last_out = remaining[index] == 0
+        if last_out and next_stage is not None:
+            for _ in range(next_stage.workers):
+                next_stage.inbox.put(_STOP)
+
+    def run(self, items):
+        self._started_at = time.perf_counter()
+        self._finished_at = None
+        with self._errors_lock:
+            self.errors = []
+        remaining = [stage.workers for stage in self.stages]
+        remaining_lock = threading.Lock()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for worker_number in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(index, remaining, remaining_lock),
+                    name=f"pipeline-{stage.name}-{worker_number}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        first_stage = self.stages[0]
+        try:
+            for item in items:
+                first_stage.inbox.put(item)
+        finally:
+            # Items already queued still drain if the feeder raises; the
+            # exception reaches the caller once every worker has exited.
+            for _ in range(first_stage.workers):
+                first_stage.inbox.put(_STOP)
+            for thread in threads:
+                thread.join()
+            self._finished_at = time.perf_counter()
+        return self.get_stats()
+
+    def get_stats(self):
+        if self._started_at is None:
+            return {"elapsed_seconds": 0.0, "stages": {}, "errors": []}
+        elapsed = (self._finished_at or time.perf_counter()) - self._started_at
+        with self._errors_lock:
+            errors = list(self.errors)
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": {stage.name: stage.get_stats(elapsed) for stage in self.stages},
+            "errors": errors,
+        }
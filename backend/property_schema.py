@@ -0,0 +1,147 @@
+import json
+import os
+
+import pandas as pd
+from sqlalchemy import Column, Date, Index, Integer, String, bindparam, inspect, select, text, update
+
+from query_cache import versions_metadata, get_table_version, bump_table_version
+from spreadsheet_reader import split_location
+
+# Classes of the floorplan detector (phase_1 data.yaml), in model order,
+# and the typed column each count is stored in.
+ROOM_TYPES = ["Room", "bathroom", "bedroom", "closet", "garage", "hall", "kitchen", "laundary", "porch"]
+ROOM_COLUMNS = {
+    "Room": "rooms",
+    "bathroom": "bathrooms",
+    "bedroom": "bedrooms",
+    "closet": "closets",
+    "garage": "garages",
+    "hall": "halls",
+    "kitchen": "kitchens",
+    "laundary": "laundries",
+    "porch": "porches",
+}
+# The properties schema version is kept in table_versions under this name.
+SCHEMA_VERSION_KEY = "properties_schema"
+PROPERTIES_SCHEMA_VERSION = 1
+BACKFILL_BATCH_SIZE = int(os.getenv("SCHEMA_BACKFILL_BATCH_SIZE", "1000"))
+
+
+def structured_columns():
+    """Typed columns derived from floorplan_data, location and listing_date."""
+    return (
+        [Column(column, Integer) for column in ROOM_COLUMNS.values()]
+        + [Column('city', String(255)), Column('listed_on', Date)]
+    )
+
+
+def structured_indexes(table_name):
+    """Indexes for the filters questions actually use: price, city, bedrooms, seller type and date."""
+    return [
+        Index(f"ix_{table_name}_price", "price"),
+        Index(f"ix_{table_name}_city_price", "city", "price"),
+        Index(f"ix_{table_name}_city_bedrooms_price", "city", "bedrooms", "price"),
+        Index(f"ix_{table_name}_bedrooms_price", "bedrooms", "price"),
+        Index(f"ix_{table_name}_seller_type_price", "seller_type", "price"),
+        Index(f"ix_{table_name}_listed_on", "listed_on"),
+    ]
+
+
+def room_counts(floorplan_json_string):
+    """Room type -> count for every ROOM_TYPES class, or None when the floorplan could not be parsed."""
+    try:
+        counts = json.loads(floorplan_json_string)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(counts, dict) or "error" in counts:
+        return None
+    return {room_type: int(counts.get(room_type, 0)) for room_type in ROOM_TYPES}
+
+
+def structured_values(location, listing_date, floorplan_json_string):
+    """Values for structured_columns(); room counts stay NULL when the floorplan could not be parsed."""
+    counts = room_counts(floorplan_json_string)
+    values = {column: counts[room_type] if counts else None for room_type, column in ROOM_COLUMNS.items()}
+    values['city'], _ = split_location(location)
+    listed_on = pd.to_datetime(listing_date, errors='coerce')
+    values['listed_on'] = None if pd.isna(listed_on) else listed_on.date()
+    return values
+
+
+def _add_missing_columns(engine, table):
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    preparer = engine.dialect.identifier_preparer
+    added = []
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name not in existing:
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN "
+                    f"{preparer.quote(column.name)} {column.type.compile(dialect=engine.dialect)}"
+                ))
+                added.append(column.name)
+    return added
+
+
+def _create_missing_indexes(engine, table):
+    existing = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+    created = []
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(engine)
+            existing.add(index.name)
+            created.append(index.name)
+    return created
+
+
+def backfill_structured_columns(engine, table, batch_size=BACKFILL_BATCH_SIZE):
+    """Fills the typed columns of every existing row from its location, listing_date and floorplan JSON."""
+    columns = [column.name for column in structured_columns()]
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam('row_id'))
+        .values({column: bindparam(column) for column in columns})
+    )
+    last_id = 0
+    updated = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.location, table.c.listing_date, table.c.floorplan_data)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            conn.execute(stmt, [
+                {"row_id": row.id, **structured_values(row.location, row.listing_date, row.floorplan_data)}
+                for row in rows
+            ])
+        last_id = rows[-1].id
+        updated += len(rows)
+    return updated
+
+
+def migrate_properties_table(engine, table):
+    """
+    Brings an existing properties table up to PROPERTIES_SCHEMA_VERSION:
+    adds any missing columns and indexes, then backfills the typed
+    columns once. Safe to call on every ETL run.
+    """
+    added = _add_missing_columns(engine, table)
+    if added:
+        print(f"Added columns to '{table.name}': {', '.join(added)}.")
+    created = _create_missing_indexes(engine, table)
+    if created:
+        print(f"Created indexes on '{table.name}': {', '.join(created)}.")
+
+    versions_metadata.create_all(engine)
+    version = get_table_version(engine, SCHEMA_VERSION_KEY)
+    if version >= PROPERTIES_SCHEMA_VERSION:
+        return
+    updated = backfill_structured_columns(engine, table)
+    while version < PROPERTIES_SCHEMA_VERSION:
+        version = bump_table_version(engine, SCHEMA_VERSION_KEY)
+    print(f"Backfilled structured columns for {updated} rows of '{table.name}' "
+          f"(schema version {version}).")
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+QDRANT_UPLOAD_BATCH_SIZE = int(os.getenv("QDRANT_UPLOAD_BATCH_SIZE", "256"))
+QDRANT_UPLOAD_PARALLEL = int(os.getenv("QDRANT_UPLOAD_PARALLEL", "4"))
+
+
+class QdrantStreamUploader:
+    """
+    Buffers points into a fixed-size float32 array and uploads each full
+    batch on a background thread while the caller keeps producing. At most
+    `parallel` uploads are in flight; add() blocks once that limit is hit,
+    so memory stays bounded by roughly (parallel + 1) * batch_size vectors.
+    """
+
+    def __init__(self, client, collection_name, dimension,
+                 batch_size=QDRANT_UPLOAD_BATCH_SIZE, parallel=QDRANT_UPLOAD_PARALLEL):
+        self.client = client
+        self.collection_name = collection_name
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=parallel)
+        self._slots = threading.BoundedSemaphore(parallel)
+        self._stats_lock = threading.Lock()
+        self._stats = {"points": 0, "batches": 0, "failed_batches": 0, "upload_seconds": 0.0}
+        self.failed_payloads = []
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        self._vectors = np.empty((self.batch_size, self.dimension), dtype=np.float32)
+        self._ids = []
+        self._payloads = []
+
+    def add(self, point_id, vector, payload):
+        self._vectors[len(self._ids)] = vector
+        self._ids.append(point_id)
+        self._payloads.append(payload)
+        if len(self._ids) == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._ids:
+            return
+        count = len(self._ids)
+        vectors, ids, payloads = self._vectors[:count], self._ids, self._payloads
+        self._reset_buffer()
+
+        # Backpressure: wait for a free upload slot before queueing more.
+        self._slots.acquire()
+        self._executor.submit(self._upload, vectors, ids, payloads)
+
+    def _upload(self, vectors, ids, payloads):
+        start = time.perf_counter()
+        try:
+            self.client.upload_collection(
+                collection_name=self.collection_name,
+                vectors=vectors,
+                payload=payloads,
+                ids=ids,
+                batch_size=len(ids),
+                wait=True
+            )
+            with self._stats_lock:
+                self._stats["points"] += len(ids)
+                self._stats["batches"] += 1
+                self._stats["upload_seconds"] += time.perf_counter() - start
+        except Exception as e:
+            print(f"Error uploading {len(ids)} points to Qdrant: {e}")
+            with self._stats_lock:
+                self._stats["failed_batches"] += 1
+                self.failed_payloads.extend(payloads)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+        return self.get_stats()
+
+    def get_stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
@@ -0,0 +1,162 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from sqlalchemy import MetaData, Table, Column, String, Integer, select, update, insert
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "900"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000"))
+TABLE_VERSIONS_TABLE_NAME = "table_versions"
+
+versions_metadata = MetaData()
+table_versions = Table(
+    TABLE_VERSIONS_TABLE_NAME,
+    versions_metadata,
+    Column('table_name', String(255), primary_key=True),
+    Column('version', Integer, nullable=False),
+)
+
+
+def get_table_version(engine, table_name):
+    with engine.connect() as conn:
+        version = conn.execute(
+            select(table_versions.c.version).where(table_versions.c.table_name == table_name)
+        ).scalar()
+    return version or 0
+
+
+def bump_table_version(engine, table_name):
+    """Called by run_etl after it changes table_name, which invalidates cached answers."""
+    versions_metadata.create_all(engine)
+    with engine.begin() as conn:
+        result = conn.execute(
+            update(table_versions)
+            .where(table_versions.c.table_name == table_name)
+            .values(version=table_versions.c.version + 1)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(table_versions).values(table_name=table_name, version=1))
+    return get_table_version(engine, table_name)
+
+
+def normalize_question(question):
+    # Case, spacing and punctuation differences should not miss the cache.
+    question = unicodedata.normalize("NFKC", question).lower()
+    question = re.sub(r"[^\w\s.]", " ", question)
+    question = re.sub(r"\.(?!\d)", " ", question)
+    return " ".join(question.split())
+
+
+def normalize_sql(sql):
+    return " ".join(sql.strip().rstrip(";").split())
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache whose entries also expire after ttl seconds."""
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class QueryCache:
+    """
+    Two caches in front of the SQL agent: normalized question -> (SQL,
+    answer) and SQL -> result rows. Every key includes the version of the
+    cached table, so an ingest that bumps it makes older entries
+    unreachable; they then age out through the TTL and LRU limits.
+    """
+
+    def __init__(self, table_name, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL):
+        self.table_name = table_name
+        self.engine = None
+        self.answers = LRUCache(max_entries, ttl)
+        self.rows = LRUCache(max_entries, ttl)
+
+    def bind(self, engine):
+        try:
+            versions_metadata.create_all(engine)
+        except Exception as e:
+            print(f"Query cache: could not create '{TABLE_VERSIONS_TABLE_NAME}': {e}")
+        self.engine = engine
+
+    def current_version(self):
+        """The table version, or None when it cannot be read (caching is then skipped)."""
+        if self.engine is None:
+            return None
+        try:
+            return get_table_version(self.engine, self.table_name)
+        except Exception as e:
+            print(f"Query cache: could not read table version: {e}")
+            return None
+
+    def get_answer(self, question, version):
+        if version is None:
+            return None
+        return self.answers.get((normalize_question(question), version))
+
+    def put_answer(self, question, sql, answer, version):
+        if version is not None:
+            self.answers.put((normalize_question(question), version), {"sql": sql, "answer": answer})
+
+    def get_rows(self, sql, version):
+        if version is None:
+            return None
+        return self.rows.get((normalize_sql(sql), version))
+
+    def put_rows(self, sql, rows, version):
+        if version is not None:
+            self.rows.put((normalize_sql(sql), version), rows)
+
+    def get_stats(self):
+        return {
+            "table_version": self.current_version(),
+            "answers": self.answers.get_stats(),
+            "rows": self.rows.get_stats(),
+        }
+
+
+query_cache = QueryCache("properties") if QUERY_CACHE_ENABLED else None
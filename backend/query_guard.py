@@ -0,0 +1,280 @@
+import os
+import re
+import threading
+from contextvars import ContextVar
+
+from sqlalchemy import inspect, text
+from sqlalchemy.types import Text
+
+QUERY_GUARD_ENABLED = os.getenv("QUERY_GUARD_ENABLED", "true").lower() == "true"
+# Largest result an agent query may return; bigger LIMITs are lowered to this.
+QUERY_GUARD_MAX_ROWS = int(os.getenv("QUERY_GUARD_MAX_ROWS", "100"))
+# Full table scans estimated to read more rows than this are rejected.
+QUERY_GUARD_MAX_SCAN_ROWS = int(os.getenv("QUERY_GUARD_MAX_SCAN_ROWS", "50000"))
+# MAX_EXECUTION_TIME hint for agent SELECTs on MySQL, in milliseconds (0 turns it off).
+QUERY_GUARD_TIMEOUT_MS = int(os.getenv("QUERY_GUARD_TIMEOUT_MS", "5000"))
+# Statements or clauses a read-only question never needs.
+FORBIDDEN_SQL = re.compile(
+    r"\b(insert|update|delete|drop|alter|create|truncate|grant|revoke|rename|into|outfile|dumpfile|load_file|"
+    r"lock|for\s+share|for\s+update|sleep|benchmark)\b",
+    re.IGNORECASE
+)
+# LIMIT count, LIMIT count OFFSET offset, or MySQL's LIMIT offset, count.
+TRAILING_LIMIT = re.compile(r"\blimit\s+(\d+)(?:\s*,\s*(\d+)|\s+offset\s+\d+)?\s*$", re.IGNORECASE)
+# Quoted strings, whose contents must not be read as SQL.
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+SQL_TOKEN = re.compile(r"`[^`]*`(?:\.`[^`]*`)*|\w+(?:\.\w+)*|[(),]|[^\s\w]")
+TABLE_LIST_START = {"from", "join", "straight_join"}
+# Keywords that end a FROM list (or a JOIN's table) at its own nesting level.
+TABLE_LIST_END = {
+    "where", "group", "order", "limit", "having", "union", "except", "intersect", "window", "on", "using",
+    "join", "inner", "left", "right", "full", "outer", "cross", "natural", "straight_join", "for", "into",
+    "procedure",
+}
+# Parts of column names too generic to count as the question asking for the column.
+GENERIC_NAME_PARTS = {"long", "data", "text", "json"}
+
+
+class InvalidSQL(Exception):
+    pass
+
+
+class QueryRejected(InvalidSQL):
+    pass
+
+
+# The /chat question being answered, so queries the ReAct agent runs
+# through its SQL tool can be pruned with it in mind.
+agent_question = ContextVar("agent_question", default=None)
+
+
+def referenced_tables(sql):
+    """
+    Every table named in a FROM list (comma joins included) or JOIN of
+    sql, which must already have its string literals stripped. FROM
+    inside function calls such as EXTRACT(YEAR FROM listed_on) is
+    skipped; derived tables are covered by their own FROM, and a
+    parenthesised table list such as FROM (a, b JOIN c ON ...) is walked
+    like the list around it.
+    """
+    tokens = SQL_TOKEN.findall(sql)
+    # For every token, whether its innermost parenthesis is a subquery (or the top level).
+    in_query = []
+    stack = []
+    for index, token in enumerate(tokens):
+        if token == "(":
+            following = tokens[index + 1].lower() if index + 1 < len(tokens) else ""
+            stack.append(following in ("select", "with"))
+        elif token == ")" and stack:
+            stack.pop()
+        in_query.append(stack[-1] if stack else True)
+
+    tables = []
+    for index, token in enumerate(tokens):
+        if token.lower() not in TABLE_LIST_START or not in_query[index]:
+            continue
+        # For every parenthesis opened since the FROM, whether it holds a table list.
+        nested = []
+        expecting_table = True
+        for position in range(index + 1, len(tokens)):
+            following = tokens[position]
+            lowered = following.lower()
+            if following == "(":
+                after = tokens[position + 1].lower() if position + 1 < len(tokens) else ""
+                is_table_list = expecting_table and after not in ("select", "with")
+                nested.append(is_table_list)
+                expecting_table = is_table_list
+            elif following == ")":
+                if not nested:
+                    break
+                nested.pop()
+                expecting_table = False
+            elif nested and not nested[-1]:
+                # A subquery, function call or index hint; subqueries are covered by their own FROM.
+                continue
+            elif lowered in TABLE_LIST_END:
+                if not nested:
+                    break
+                expecting_table = lowered in ("join", "straight_join")
+            elif following == ",":
+                expecting_table = True
+            elif expecting_table:
+                tables.append(following.replace("`", ""))
+                expecting_table = False
+    return tables
+
+
+def validate_sql(sql, table_name):
+    """Raises InvalidSQL unless sql is a single read-only query over table_name (or its own CTEs)."""
+    if not sql:
+        raise InvalidSQL("empty query")
+    # Keywords are only looked for outside quoted strings, so LIKE '%update%' is fine.
+    code = STRING_LITERAL.sub("''", sql)
+    if ";" in code:
+        raise InvalidSQL("more than one statement")
+    if re.search(r"/\*|--|#", code):
+        # MySQL runs /*! ... */ comments as SQL, so none are accepted.
+        raise InvalidSQL("contains a comment")
+    if not re.match(r"^\s*(select|with)\b", code, re.IGNORECASE):
+        raise InvalidSQL("not a SELECT")
+    forbidden = FORBIDDEN_SQL.search(code)
+    if forbidden:
+        raise InvalidSQL(f"uses '{forbidden.group(1)}'")
+
+    cte_names = {name.lower() for name in re.findall(r"`?(\w+)`?\s+as\s*\(", code, re.IGNORECASE)}
+    for table in referenced_tables(code):
+        if table.lower() != table_name.lower() and table.lower() not in cte_names:
+            raise InvalidSQL(f"reads table '{table}'")
+    return sql
+
+
+class QueryGuard:
+    """
+    Sits between the SQL agents and the database. Every query is
+    validated as a single read-only SELECT over the table, SELECT * drops
+    wide TEXT columns the question did not mention, a LIMIT is added or
+    lowered to max_rows, MySQL gets a MAX_EXECUTION_TIME hint, and an
+    EXPLAIN runs first: its plan is logged, and full scans estimated
+    above max_scan_rows are rejected before they reach the table.
+    Callers with a result cache use rewrite() for the cache key and
+    check() only on a miss, so cached queries never reach MySQL.
+    """
+
+    def __init__(self, table_name, max_rows=QUERY_GUARD_MAX_ROWS, max_scan_rows=QUERY_GUARD_MAX_SCAN_ROWS,
+                 timeout_ms=QUERY_GUARD_TIMEOUT_MS):
+        self.table_name = table_name
+        self.max_rows = max_rows
+        self.max_scan_rows = max_scan_rows
+        self.timeout_ms = timeout_ms
+        self.engine = None
+        self._columns = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"checked": 0, "explained": 0, "rejected": 0, "limit_added": 0, "limit_lowered": 0,
+                       "columns_dropped": 0}
+        self.last_plan = None
+
+    def bind(self, engine):
+        self.engine = engine
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def columns(self):
+        """(all column names, wide TEXT column names, leading columns of indexes), reflected once."""
+        if self._columns is None:
+            inspector = inspect(self.engine)
+            columns = inspector.get_columns(self.table_name)
+            indexed = {index["column_names"][0] for index in inspector.get_indexes(self.table_name)
+                       if index["column_names"] and index["column_names"][0]}
+            self._columns = (
+                [column["name"] for column in columns],
+                {column["name"] for column in columns if isinstance(column["type"], Text)},
+                sorted(indexed),
+            )
+        return self._columns
+
+    def _drop_wide_columns(self, sql, question):
+        star = re.match(rf"^\s*select\s+(distinct\s+)?\*\s+from\s+`?{re.escape(self.table_name)}`?\b",
+                        sql, re.IGNORECASE)
+        if not star:
+            return sql
+        names, wide, _ = self.columns()
+        asked = (question or "").lower()
+        dropped = {
+            name for name in wide
+            if not any(part in asked for part in name.lower().split("_") if part not in GENERIC_NAME_PARTS)
+        }
+        if not dropped:
+            return sql
+        self._count("columns_dropped")
+        kept = ", ".join(name for name in names if name not in dropped)
+        return sql[:star.start()] + f"SELECT {star.group(1) or ''}{kept} FROM {self.table_name}" + sql[star.end():]
+
+    def _limit(self, sql):
+        match = TRAILING_LIMIT.search(sql)
+        if match is None:
+            self._count("limit_added")
+            return f"{sql} LIMIT {self.max_rows}"
+        count_group = 2 if match.group(2) is not None else 1
+        if int(match.group(count_group)) > self.max_rows:
+            self._count("limit_lowered")
+            return sql[:match.start(count_group)] + str(self.max_rows) + sql[match.end(count_group):]
+        return sql
+
+    def _explain(self, sql):
+        """Returns (plan lines, estimated rows read by full scans, or None when the dialect has no estimate)."""
+        dialect = self.engine.dialect.name
+        with self.engine.connect() as conn:
+            if dialect == "sqlite":
+                rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).mappings().all()
+                return [row["detail"] for row in rows], None
+            rows = conn.execute(text(f"EXPLAIN {sql}")).mappings().all()
+
+        lines = []
+        full_scan_rows = 0
+        for row in rows:
+            extra = row.get("Extra") or ""
+            lines.append(f"table={row.get('table')} type={row.get('type')} key={row.get('key')} "
+                         f"rows={row.get('rows')} extra={extra}")
+            # A bare scan stops at the LIMIT; one that filters, sorts or groups reads every row first.
+            if row.get("type") == "ALL" and any(
+                    marker in extra for marker in ("Using where", "Using filesort", "Using temporary")):
+                full_scan_rows += int(row.get("rows") or 0)
+        return lines, full_scan_rows
+
+    def rewrite(self, sql, question=None):
+        """
+        The cheap half of prepare(): validates sql and applies the column
+        pruning and LIMIT, without touching the database beyond the cached
+        column list. Its result is what query results are cached under.
+        """
+        self._count("checked")
+        try:
+            sql = validate_sql(sql.strip().rstrip(";").strip(), self.table_name)
+        except InvalidSQL:
+            self._count("rejected")
+            raise
+        if self.engine is None:
+            return self._limit(sql)
+        return self._limit(self._drop_wide_columns(sql, question))
+
+    def check(self, sql):
+        """
+        The expensive half of prepare(), for SQL from rewrite(): EXPLAINs
+        it, raises QueryRejected for large unindexed scans, and returns it
+        with the MAX_EXECUTION_TIME hint. Only needed when the result is
+        not already cached.
+        """
+        if self.engine is None:
+            return sql
+        self._count("explained")
+        plan, full_scan_rows = self._explain(sql)
+        self.last_plan = plan
+        print(f"Query guard plan for [{' '.join(sql.split())[:200]}]: {' | '.join(plan)}")
+        if full_scan_rows is not None and full_scan_rows > self.max_scan_rows:
+            self._count("rejected")
+            _, _, indexed = self.columns()
+            raise QueryRejected(
+                f"query would scan about {full_scan_rows} rows of '{self.table_name}' without an index; "
+                f"filter on an indexed column ({', '.join(indexed)}) or drop the ORDER BY/GROUP BY"
+            )
+
+        if self.timeout_ms > 0 and self.engine.dialect.name == "mysql" and re.match(r"^\s*select\b", sql, re.IGNORECASE):
+            sql = re.sub(r"^\s*select\b", f"SELECT /*+ MAX_EXECUTION_TIME({self.timeout_ms}) */", sql,
+                         count=1, flags=re.IGNORECASE)
+        return sql
+
+    def prepare(self, sql, question=None):
+        """
+        Returns sql rewritten to run safely, or raises InvalidSQL /
+        QueryRejected with a reason the LLM can act on.
+        """
+        return self.check(self.rewrite(sql, question))
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({"max_rows": self.max_rows, "max_scan_rows": self.max_scan_rows,
+                      "timeout_ms": self.timeout_ms, "last_plan": self.last_plan})
+        return stats
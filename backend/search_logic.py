@@ -0,0 +1,356 @@
+import json
+import os
+import re
+import threading
+import time
+
+from qdrant_client import models
+from sqlalchemy import MetaData, Table, func, select
+
+from ingest_logic import (
+    DB_TABLE_NAME, QDRANT_COLLECTION,
+    get_db_engine, get_qdrant_client, load_embedding_model,
+)
+from query_cache import LRUCache, get_table_version, normalize_question
+from spreadsheet_reader import split_location
+
+SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", "10"))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "50"))
+# A property can match through its description and each certificate, so
+# more chunks than properties are fetched before grouping.
+SEARCH_OVERSAMPLE = int(os.getenv("SEARCH_OVERSAMPLE", "4"))
+# How much the share of query words found in a listing's text adds to its vector score.
+SEARCH_KEYWORD_WEIGHT = float(os.getenv("SEARCH_KEYWORD_WEIGHT", "0.15"))
+SEARCH_VECTOR_CACHE_SIZE = int(os.getenv("SEARCH_VECTOR_CACHE_SIZE", "1000"))
+# Search-time HNSW beam width (None uses Qdrant's default), and how many
+# extra candidates the int8 search keeps for rescoring with full vectors.
+SEARCH_HNSW_EF = int(os.getenv("SEARCH_HNSW_EF", "0")) or None
+SEARCH_RESCORE_OVERSAMPLING = float(os.getenv("SEARCH_RESCORE_OVERSAMPLING", "2.0"))
+
+PRICE_UNITS = {
+    "k": 1e3, "thousand": 1e3,
+    "l": 1e5, "lac": 1e5, "lacs": 1e5, "lakh": 1e5, "lakhs": 1e5,
+    "m": 1e6, "million": 1e6, "mn": 1e6,
+    "cr": 1e7, "crore": 1e7, "crores": 1e7,
+}
+# Numbers followed by these are distances, durations or sizes, never prices.
+NON_PRICE_UNITS = (
+    "km", "kms", "kilometers?", "kilometres?", "miles?", "meters?", "metres?", "mins?", "minutes?",
+    "hrs?", "hours?", "days?", "weeks?", "months?", "years?", "yrs?", "sq", "sqft", "square", "ft", "feet",
+    "acres?", "floors?", "storeys?", "stories", "%", "percent",
+)
+# Without a currency marker or unit, smaller numbers are not read as rupees ("under 2 km").
+SEARCH_MIN_BARE_PRICE = float(os.getenv("SEARCH_MIN_BARE_PRICE", "10000"))
+_AMOUNT = (
+    r"(rs\.?|inr|₹)?\s*(\d+(?:\.\d+)?)(?![\d.])(?!\s*(?:" + "|".join(NON_PRICE_UNITS) + r")(?!\w))"
+    r"\s*(" + "|".join(sorted(PRICE_UNITS, key=len, reverse=True)) + r")?\b"
+)
+PRICE_RANGE_PATTERN = re.compile(r"\bbetween\s+" + _AMOUNT + r"\s*(?:and|to|-)\s*" + _AMOUNT, re.IGNORECASE)
+MAX_PRICE_PATTERN = re.compile(r"(?:\b(?:under|below|less than|up ?to|max(?:imum)?)|<=?)\s*" + _AMOUNT,
+                               re.IGNORECASE)
+MIN_PRICE_PATTERN = re.compile(r"(?:\b(?:over|above|more than|at least|min(?:imum)?)|>=?)\s*" + _AMOUNT,
+                               re.IGNORECASE)
+ROOM_WORDS = {
+    "bhk": "bedroom", "bed": "bedroom", "beds": "bedroom", "bedroom": "bedroom", "bedrooms": "bedroom",
+    "br": "bedroom", "bath": "bathroom", "baths": "bathroom", "bathroom": "bathroom", "bathrooms": "bathroom",
+    "garage": "garage", "garages": "garage", "kitchen": "kitchen", "kitchens": "kitchen",
+    "hall": "hall", "halls": "hall", "closet": "closet", "closets": "closet",
+    "porch": "porch", "porches": "porch", "laundry": "laundary", "laundries": "laundary",
+}
+# Words before a room count that make it a maximum; the strict ones
+# ("under 3 bedrooms") allow one fewer room than the number.
+ROOM_UPPER_BOUNDS = {
+    "up to": 0, "upto": 0, "at most": 0, "max": 0, "maximum": 0, "no more than": 0,
+    "under": 1, "below": 1, "less than": 1, "fewer than": 1,
+}
+ROOM_PATTERN = re.compile(
+    r"(?:\b(" + "|".join(sorted(ROOM_UPPER_BOUNDS, key=len, reverse=True)).replace(" ", r"\s+") + r")\s+)?"
+    r"\b(\d+)\s*-?\s*(" + "|".join(sorted(ROOM_WORDS, key=len, reverse=True)) + r")\b", re.IGNORECASE
+)
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "at", "for", "from", "has", "have", "home", "homes", "house", "in", "is",
+    "me", "near", "of", "on", "or", "property", "show", "some", "the", "to", "with", "within", "find",
+}
+SNIPPET_CHARS = 300
+
+
+def _amount(value, unit):
+    return float(value) * PRICE_UNITS.get((unit or "").lower(), 1.0)
+
+
+def _price(currency, value, unit):
+    """Rupees for a matched amount, or None for a bare number too small to be a price."""
+    if not currency and not unit and float(value) < SEARCH_MIN_BARE_PRICE:
+        return None
+    return _amount(value, unit)
+
+
+def parse_query(query, known_cities=(), known_states=()):
+    """
+    Pulls structured constraints out of a free-text query without an LLM:
+    prices like "under 80L", "above 1.5 crore" or "between 50 and 90
+    lakh" (plain numbers are rupees, but only from SEARCH_MIN_BARE_PRICE
+    up, so "under 2 km" sets no price), room counts like "3 BHK" or "2
+    baths" (as minimums) or "up to 3 bedrooms" (as maximums), and any
+    known city or state. Returns
+    (text to embed, filters); price and room phrases are removed from
+    the text since the filters already cover them.
+    """
+    filters = {}
+    text = query
+
+    # Rooms first, so "up to 3 bedrooms" is not read as a price.
+    min_rooms, max_rooms = {}, {}
+    for bound, count, word in ROOM_PATTERN.findall(text):
+        room_type = ROOM_WORDS[word.lower()]
+        if bound:
+            limit = int(count) - ROOM_UPPER_BOUNDS[" ".join(bound.lower().split())]
+            max_rooms[room_type] = min(max_rooms.get(room_type, limit), limit)
+        else:
+            min_rooms[room_type] = max(min_rooms.get(room_type, 0), int(count))
+    if min_rooms:
+        filters["min_rooms"] = min_rooms
+    if max_rooms:
+        filters["max_rooms"] = max_rooms
+    text = ROOM_PATTERN.sub(" ", text)
+
+    for match in PRICE_RANGE_PATTERN.finditer(text):
+        low_currency, low, low_unit, high_currency, high, high_unit = match.groups()
+        # "between 50 and 90 lakh": the low end shares the high end's unit and currency.
+        currency = low_currency or high_currency
+        low_price = _price(currency, low, low_unit or high_unit)
+        high_price = _price(currency, high, high_unit)
+        if low_price is not None and high_price is not None:
+            filters["min_price"], filters["max_price"] = low_price, high_price
+            text = text.replace(match.group(0), " ")
+            break
+    for pattern, key in ((MAX_PRICE_PATTERN, "max_price"), (MIN_PRICE_PATTERN, "min_price")):
+        if key in filters:
+            continue
+        for match in pattern.finditer(text):
+            price = _price(*match.groups())
+            if price is not None:
+                filters[key] = price
+                text = text.replace(match.group(0), " ")
+                break
+
+    lowered = f" {normalize_question(query)} "
+    cities = [city for city in known_cities if f" {city} " in lowered]
+    states = [state for state in known_states if f" {state} " in lowered and state not in cities]
+    if cities:
+        filters["cities"] = cities
+    if states:
+        filters["states"] = states
+
+    return " ".join(text.split()) or query, filters
+
+
+def build_qdrant_filter(filters):
+    """Turns parse_query/request filters into a Qdrant payload filter (None when there are none)."""
+    must = []
+    if filters.get("min_price") is not None or filters.get("max_price") is not None:
+        must.append(models.FieldCondition(
+            key="price", range=models.Range(gte=filters.get("min_price"), lte=filters.get("max_price"))
+        ))
+    if filters.get("cities"):
+        must.append(models.FieldCondition(key="city", match=models.MatchAny(any=filters["cities"])))
+    if filters.get("states"):
+        must.append(models.FieldCondition(key="state", match=models.MatchAny(any=filters["states"])))
+    if filters.get("seller_type"):
+        must.append(models.FieldCondition(key="seller_type", match=models.MatchValue(value=filters["seller_type"])))
+    for room_type, count in (filters.get("min_rooms") or {}).items():
+        must.append(models.FieldCondition(key=f"rooms.{room_type}", range=models.Range(gte=count)))
+    for room_type, count in (filters.get("max_rooms") or {}).items():
+        must.append(models.FieldCondition(key=f"rooms.{room_type}", range=models.Range(lte=count)))
+    return models.Filter(must=must) if must else None
+
+
+def keyword_overlap(query, text):
+    """Share of the query's content words that appear in text."""
+    words = {word for word in normalize_question(query).split() if len(word) > 2 and word not in STOPWORDS}
+    if not words:
+        return 0.0
+    found = set(normalize_question(text).split())
+    return len(words & found) / len(words)
+
+
+class PropertySearch:
+    """
+    Hybrid search without an LLM: the query is embedded once, searched in
+    Qdrant with payload filters for price, city/state, seller type and
+    room counts, and the matching properties are loaded from MySQL in a
+    single IN (...) query and reranked by vector score plus keyword
+    overlap with the listing text.
+    """
+
+    def __init__(self, table_name=DB_TABLE_NAME):
+        self.table_name = table_name
+        self._table = None
+        self._locations = None
+        self._locations_version = None
+        self._lock = threading.Lock()
+        self.vectors = LRUCache(max_entries=SEARCH_VECTOR_CACHE_SIZE)
+        self._stats_lock = threading.Lock()
+        self._stats = {"searches": 0, "embed_seconds": 0.0, "qdrant_seconds": 0.0, "mysql_seconds": 0.0,
+                       "total_seconds": 0.0}
+
+    def _properties_table(self, engine):
+        if self._table is None:
+            self._table = Table(self.table_name, MetaData(), autoload_with=engine)
+        return self._table
+
+    def known_locations(self, engine):
+        """Lower-cased (cities, states) in the table, reloaded only when an ingest bumps its version."""
+        try:
+            version = get_table_version(engine, self.table_name)
+        except Exception:
+            # No ingest has created table_versions yet.
+            version = None
+        with self._lock:
+            if self._locations is not None and version == self._locations_version:
+                return self._locations
+        table = self._properties_table(engine)
+        with engine.connect() as conn:
+            if "city" in table.c:
+                # One row per city off the city index, with one of its
+                # locations to read the state from.
+                locations = conn.execute(
+                    select(table.c.city, func.min(table.c.location))
+                    .where(table.c.city.is_not(None))
+                    .group_by(table.c.city)
+                ).fetchall()
+            else:
+                locations = [(None, location) for location in
+                             conn.execute(select(table.c.location).distinct()).scalars().all()]
+        cities, states = set(), set()
+        for city_value, location in locations:
+            city, state = split_location(location)
+            city = city_value or city
+            if city:
+                cities.add(city.lower())
+            if state:
+                states.add(state.lower())
+        # Longest first, so "navi mumbai" is tried before "mumbai".
+        located = (sorted(cities, key=len, reverse=True), sorted(states, key=len, reverse=True))
+        with self._lock:
+            self._locations, self._locations_version = located, version
+        return located
+
+    def embed(self, text):
+        # The normalized text is both the key and what gets encoded, so
+        # every spelling that shares a cache entry also shares its vector.
+        key = normalize_question(text)
+        vector = self.vectors.get(key)
+        if vector is None:
+            vector = load_embedding_model().encode(key).tolist()
+            self.vectors.put(key, vector)
+        return vector
+
+    def fetch_properties(self, engine, property_ids):
+        """property_id -> row dict, in one batched WHERE property_id IN (...) query."""
+        if not property_ids:
+            return {}
+        table = self._properties_table(engine)
+        columns = [column for column in table.columns if column.name != "id"]
+        with engine.connect() as conn:
+            rows = conn.execute(select(*columns).where(table.c.property_id.in_(property_ids))).mappings().all()
+        return {row["property_id"]: dict(row) for row in rows}
+
+    def search(self, query, filters=None, limit=SEARCH_DEFAULT_LIMIT):
+        """
+        Returns {"query", "filters", "results", "timings_ms"}. Filters
+        passed in override the ones parsed from the query.
+        """
+        started = time.perf_counter()
+        limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+        engine = get_db_engine()
+
+        cities, states = self.known_locations(engine)
+        text, parsed = parse_query(query, cities, states)
+        filters = {**parsed, **{key: value for key, value in (filters or {}).items() if value not in (None, "", {})}}
+
+        vector = self.embed(text)
+        embedded = time.perf_counter()
+
+        points = get_qdrant_client().query_points(
+            collection_name=QDRANT_COLLECTION,
+            query=vector,
+            query_filter=build_qdrant_filter(filters),
+            limit=limit * SEARCH_OVERSAMPLE,
+            search_params=models.SearchParams(
+                hnsw_ef=SEARCH_HNSW_EF,
+                quantization=models.QuantizationSearchParams(rescore=True, oversampling=SEARCH_RESCORE_OVERSAMPLING),
+            ),
+            with_payload=["property_id", "chunk_type", "certificate_file"],
+        ).points
+        searched = time.perf_counter()
+
+        hits = {}
+        for point in points:
+            payload = point.payload or {}
+            prop_id = payload.get("property_id")
+            if prop_id is None:
+                continue
+            hit = hits.setdefault(prop_id, {"vector_score": point.score, "matched": []})
+            hit["vector_score"] = max(hit["vector_score"], point.score)
+            hit["matched"].append(payload.get("certificate_file") or payload.get("chunk_type"))
+
+        rows = self.fetch_properties(engine, list(hits))
+        fetched = time.perf_counter()
+
+        results = []
+        for prop_id, hit in hits.items():
+            row = rows.get(prop_id)
+            if row is None:
+                # Deleted from MySQL since its points were written.
+                continue
+            listing_text = " ".join(str(row.get(column) or "") for column in
+                                    ("title", "long_description", "metadata_tags", "location"))
+            overlap = keyword_overlap(text, listing_text)
+            try:
+                row["floorplan_data"] = json.loads(row["floorplan_data"]) if row.get("floorplan_data") else None
+            except ValueError:
+                pass
+            description = row.pop("long_description", None) or ""
+            row["description_snippet"] = description[:SNIPPET_CHARS] + ("..." if len(description) > SNIPPET_CHARS else "")
+            results.append({
+                **row,
+                "score": hit["vector_score"] + SEARCH_KEYWORD_WEIGHT * overlap,
+                "vector_score": hit["vector_score"],
+                "keyword_overlap": overlap,
+                "matched_chunks": hit["matched"],
+            })
+        results.sort(key=lambda result: result["score"], reverse=True)
+        results = results[:limit]
+        finished = time.perf_counter()
+
+        timings = {
+            "embed_seconds": embedded - started,
+            "qdrant_seconds": searched - embedded,
+            "mysql_seconds": fetched - searched,
+            "total_seconds": finished - started,
+        }
+        with self._stats_lock:
+            self._stats["searches"] += 1
+            for key, seconds in timings.items():
+                self._stats[key] += seconds
+
+        return {
+            "query": query,
+            "search_text": text,
+            "filters": filters,
+            "results": results,
+            "timings_ms": {key.replace("_seconds", ""): round(seconds * 1000, 2) for key, seconds in timings.items()},
+        }
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        for key in ("embed", "qdrant", "mysql", "total"):
+            seconds = stats.pop(f"{key}_seconds")
+            stats[f"avg_{key}_ms"] = seconds * 1000 / stats["searches"] if stats["searches"] else 0.0
+        stats["vector_cache"] = self.vectors.get_stats()
+        return stats
+
+
+property_search = PropertySearch()
@@ -0,0 +1,125 @@
+import os
+
+import pandas as pd
+
+READ_BATCH_SIZE = int(os.getenv("ETL_READ_BATCH_SIZE", "1000"))
+SUPPORTED_EXTENSIONS = (".xlsx", ".csv", ".parquet")
+COLUMNS = [
+    'property_id', 'image_file', 'title', 'long_description', 'location', 'price',
+    'seller_type', 'listing_date', 'certificates', 'seller_contact', 'metadata_tags',
+]
+TEXT_COLUMNS = ['title', 'long_description', 'certificates']
+
+
+def _extension(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Unsupported property file '{os.path.basename(path)}' "
+                         f"(expected one of {', '.join(SUPPORTED_EXTENSIONS)})")
+    return extension
+
+
+def _iter_excel(path, batch_size):
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the sheet XML instead of building the whole workbook.
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(name) if name is not None else f"column_{index}" for index, name in enumerate(header)]
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield pd.DataFrame.from_records(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def _iter_csv(path, batch_size):
+    # property_id must stay text, or IDs like 00123 lose their zeros.
+    yield from pd.read_csv(path, chunksize=batch_size, dtype={'property_id': str, 'seller_contact': str})
+
+
+def _iter_parquet(path, batch_size):
+    import pyarrow.parquet as pq
+
+    for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield record_batch.to_pandas()
+
+
+def clean_batch(df):
+    """
+    Vectorized per-batch cleaning: missing columns are added, text columns
+    get '' for blanks, price becomes a float (0.0 when missing or not a
+    number), listing_date a timestamp, and only the last row of each
+    property_id in the batch is kept. Any other blank cell becomes None
+    rather than NaN/NaT, which MySQL drivers reject. Rows with a blank
+    property_id are dropped and counted in df.attrs['rows_without_id'].
+    """
+    for column in COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    for column in TEXT_COLUMNS:
+        df[column] = df[column].fillna('').astype(str)
+    df['price'] = pd.to_numeric(df['price'], errors='coerce').fillna(0.0).astype(float)
+    df['listing_date'] = pd.to_datetime(df['listing_date'], errors='coerce')
+    df = df.astype(object).where(df.notna(), None)
+    # Rows without an ID cannot be upserted; casting them would merge them all into one 'None' property.
+    has_id = df['property_id'].map(lambda value: value is not None and str(value).strip() != '')
+    dropped = int((~has_id).sum())
+    df = df[has_id].copy()
+    df['property_id'] = df['property_id'].astype(str).str.strip()
+    df = df.drop_duplicates(subset='property_id', keep='last').reset_index(drop=True)
+    df.attrs['rows_without_id'] = dropped
+    return df
+
+
+def split_location(location):
+    """Returns (city, state) from a free-text address ending in "City, State"; either may be None."""
+    parts = [part.strip() for part in str(location or '').replace("\n", ",").split(",") if part.strip()]
+    if len(parts) >= 2:
+        return parts[-2], parts[-1]
+    return (parts[0], None) if parts else (None, None)
+
+
+def iter_row_batches(path, batch_size=READ_BATCH_SIZE):
+    """
+    Yields cleaned DataFrames of at most batch_size rows from an .xlsx,
+    .csv or .parquet property file, so memory stays bounded by the batch
+    size and the first rows arrive before the file has been fully read.
+    """
+    readers = {".xlsx": _iter_excel, ".csv": _iter_csv, ".parquet": _iter_parquet}
+    reader = readers[_extension(path)]
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    for df in reader(path, batch_size):
+        if not df.empty:
+            cleaned = clean_batch(df)
+            if not cleaned.empty or cleaned.attrs['rows_without_id']:
+                yield cleaned
+
+
+def count_rows(path):
+    """Cheap row count from file metadata, or None when the format has none (CSV)."""
+    extension = _extension(path)
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if extension == ".xlsx":
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        return max_row - 1 if max_row else None
+    return None
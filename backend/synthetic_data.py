@@ -0,0 +1,90 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
+TEMPLATE_PATH = os.path.join(ASSETS_DIR, "Property_list.xlsx")
+IMAGE_DIR = os.path.join(ASSETS_DIR, "images")
+CERT_DIR = os.path.join(ASSETS_DIR, "certificates")
+DEFAULT_OUTPUT_DIR = os.path.join(SCRIPT_DIR, "benchmark_results", "data")
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def generate_property_list(rows, template_path=TEMPLATE_PATH, seed=0):
+    """
+    Builds a synthetic property spreadsheet shaped like Property_list.xlsx.
+    Every column is sampled independently from the real rows, descriptions
+    are stitched from real sentences so most texts are unique, and image
+    and certificate names only ever point at files that exist in assets/.
+    """
+    rng = np.random.default_rng(seed)
+    template = pd.read_excel(template_path)
+
+    images = sorted(os.listdir(IMAGE_DIR))
+    certificates = sorted(os.listdir(CERT_DIR))
+    sentences = sorted({
+        sentence.strip()
+        for description in template['long_description'].dropna()
+        for sentence in str(description).split('.')
+        if sentence.strip()
+    })
+
+    def sample(column):
+        values = template[column].dropna().to_numpy()
+        return values[rng.integers(0, len(values), rows)]
+
+    descriptions = [
+        ". ".join(sentences[index] for index in rng.choice(len(sentences), size=count, replace=False)) + "."
+        for count in rng.integers(2, min(6, len(sentences)) + 1, rows)
+    ]
+    certificate_lists = [
+        "|".join(rng.choice(certificates, size=count, replace=False))
+        for count in rng.integers(0, len(certificates) + 1, rows)
+    ]
+    start, end = template['listing_date'].min(), template['listing_date'].max()
+    listing_dates = start + (end - start) * rng.random(rows)
+
+    return pd.DataFrame({
+        'property_id': [f"SYN-{index:07d}" for index in range(rows)],
+        'image_file': np.array(images)[rng.integers(0, len(images), rows)],
+        'title': sample('title'),
+        'long_description': descriptions,
+        'location': sample('location'),
+        'price': (sample('price') * rng.uniform(0.8, 1.2, rows)).round(),
+        'seller_type': sample('seller_type'),
+        'listing_date': listing_dates,
+        'certificates': certificate_lists,
+        'seller_contact': np.nan,
+        'metadata_tags': sample('metadata_tags'),
+    })
+
+
+def write_property_list(rows, output_dir=DEFAULT_OUTPUT_DIR, seed=0, file_format="xlsx"):
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"Property_list_{rows}.{file_format}")
+    print(f"Generating {rows} synthetic properties...")
+    df = generate_property_list(rows, seed=seed)
+    if file_format == "csv":
+        df.to_csv(output_path, index=False)
+    elif file_format == "parquet":
+        df.to_parquet(output_path, index=False)
+    else:
+        df.to_excel(output_path, index=False)
+    print(f"Saved to: {output_path}")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic Property_list spreadsheets.")
+    parser.add_argument("--rows", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet"], default="xlsx")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        write_property_list(rows, args.output_dir, args.seed, args.format)
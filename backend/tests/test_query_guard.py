@@ -0,0 +1,49 @@
+import pytest
+
+from query_guard import InvalidSQL, QueryGuard, referenced_tables, validate_sql
+
+TABLE = "properties"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM properties WHERE city = 'Pune'",
+    "SELECT EXTRACT(YEAR FROM listed_on) FROM properties",
+    "SELECT * FROM (SELECT property_id FROM properties) AS t",
+    "SELECT * FROM properties USE INDEX (idx_city) WHERE city = 'Pune'",
+    "WITH cheap AS (SELECT * FROM properties WHERE price < 100) SELECT * FROM cheap",
+    "SELECT * FROM properties WHERE title LIKE '%update%'",
+])
+def test_accepts_read_only_queries_over_the_table(sql):
+    assert validate_sql(sql, TABLE) == sql
+
+
+@pytest.mark.parametrize("sql, reason", [
+    ("SELECT * FROM (properties, ingest_jobs)", "ingest_jobs"),
+    ("SELECT * FROM ((properties) JOIN ingest_jobs ON 1 = 1)", "ingest_jobs"),
+    ("SELECT * FROM properties p JOIN (ingest_jobs j) ON 1 = 1", "ingest_jobs"),
+    ("SELECT * FROM properties, ingest_jobs", "ingest_jobs"),
+    ("SELECT * FROM properties WHERE property_id IN (SELECT id FROM ingest_jobs)", "ingest_jobs"),
+    ("SELECT load_file('/etc/passwd') FROM properties", "load_file"),
+    ("SELECT * FROM properties INTO OUTFILE '/tmp/out'", "into"),
+    ("SELECT * FROM properties INTO DUMPFILE '/tmp/out'", "into"),
+    ("SELECT * FROM properties FOR SHARE", "for share"),
+    ("SELECT * FROM properties FOR UPDATE", "for update"),
+    ("SELECT * FROM properties LOCK IN SHARE MODE", "lock"),
+    ("SELECT 1; DROP TABLE properties", "statement"),
+    ("SELECT /*!50000 sleep(5) */ 1 FROM properties", "comment"),
+])
+def test_rejects_other_tables_and_side_effects(sql, reason):
+    with pytest.raises(InvalidSQL, match=f"(?i){reason}"):
+        validate_sql(sql, TABLE)
+
+
+def test_parenthesised_table_lists_are_walked():
+    assert referenced_tables("SELECT * FROM (properties, ingest_jobs)") == ["properties", "ingest_jobs"]
+
+
+def test_limit_is_added_or_lowered():
+    guard = QueryGuard(TABLE, max_rows=10)
+    assert guard.prepare("SELECT * FROM properties").endswith("LIMIT 10")
+    assert guard.prepare("SELECT * FROM properties LIMIT 500").endswith("LIMIT 10")
+    assert guard.prepare("SELECT * FROM properties LIMIT 20, 500").endswith("LIMIT 20, 10")
+    assert guard.prepare("SELECT * FROM properties LIMIT 5").endswith("LIMIT 5")
@@ -0,0 +1,45 @@
+import pytest
+
+from search_logic import parse_query
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("3 BHK under 80L", {"min_rooms": {"bedroom": 3}, "max_price": 8e6}),
+    ("above 1.5 crore", {"min_price": 1.5e7}),
+    ("between 50 and 90 lakh", {"min_price": 5e6, "max_price": 9e6}),
+    ("under 5000000", {"max_price": 5e6}),
+    ("under rs 500", {"max_price": 500.0}),
+    ("up to 3 bedrooms", {"max_rooms": {"bedroom": 3}}),
+    ("at most 2 bathrooms", {"max_rooms": {"bathroom": 2}}),
+    ("no more than 2 baths", {"max_rooms": {"bathroom": 2}}),
+    ("under 3 bedrooms", {"max_rooms": {"bedroom": 2}}),
+    ("at least 2 bhk with max 1 bath", {"min_rooms": {"bedroom": 2}, "max_rooms": {"bathroom": 1}}),
+])
+def test_parses_prices_and_rooms(query, expected):
+    _, filters = parse_query(query)
+    assert filters == expected
+
+
+@pytest.mark.parametrize("query", [
+    "apartment under 2 km from metro",
+    "flat within 10 minutes of the station",
+    "less than 15 mins to the airport",
+    "between 2 and 3 km from the beach",
+    "over 20 years old",
+    "under 2.5 km from school",
+])
+def test_distances_and_durations_are_not_prices(query):
+    text, filters = parse_query(query)
+    assert "min_price" not in filters and "max_price" not in filters
+    assert text == query
+
+
+def test_price_after_a_distance_is_still_found():
+    _, filters = parse_query("under 2 km from metro and under 60 lakh")
+    assert filters == {"max_price": 6e6}
+
+
+def test_known_cities_become_filters():
+    text, filters = parse_query("2 bhk in pune under 50 lakh", known_cities=["pune"])
+    assert filters["cities"] == ["pune"]
+    assert text == "in pune"
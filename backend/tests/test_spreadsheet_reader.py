@@ -0,0 +1,50 @@
+import math
+
+from spreadsheet_reader import iter_row_batches, split_location
+
+
+def test_csv_blank_optional_cells_become_none(tmp_path):
+    path = tmp_path / "properties.csv"
+    path.write_text(
+        "property_id,image_file,title,long_description,location,price,seller_type,"
+        "listing_date,certificates,seller_contact,metadata_tags\n"
+        "00123,a.png,Flat,Nice,\"Baner, Pune, Maharashtra\",100,owner,2024-01-05,c.pdf,98765,tag\n"
+        "00124,b.png,,,,,,,,,\n"
+    )
+
+    batches = list(iter_row_batches(str(path)))
+    assert len(batches) == 1
+    full, blank = batches[0].to_dict("records")
+
+    assert full["property_id"] == "00123"
+    assert full["seller_contact"] == "98765"
+    assert str(full["listing_date"]).startswith("2024-01-05")
+
+    assert blank["property_id"] == "00124"
+    assert blank["title"] == "" and blank["long_description"] == "" and blank["certificates"] == ""
+    assert blank["price"] == 0.0
+    for column in ("location", "seller_type", "listing_date", "seller_contact", "metadata_tags"):
+        assert blank[column] is None, column
+    assert not any(isinstance(value, float) and math.isnan(value) for value in blank.values())
+
+
+def test_last_row_of_a_property_wins(tmp_path):
+    path = tmp_path / "properties.csv"
+    path.write_text("property_id,title\n1,old\n1,new\n")
+    (batch,) = iter_row_batches(str(path))
+    assert batch.to_dict("records")[0]["title"] == "new"
+
+
+def test_split_location():
+    assert split_location("Baner, Pune, Maharashtra") == ("Pune", "Maharashtra")
+    assert split_location("Pune") == ("Pune", None)
+    assert split_location(None) == (None, None)
+
+
+def test_rows_without_property_id_are_dropped_and_counted(tmp_path):
+    path = tmp_path / "properties.csv"
+    path.write_text("property_id,title\n1,first\n,no id\n  ,blank id\n2,second\n")
+    (batch,) = iter_row_batches(str(path))
+    assert [row["property_id"] for row in batch.to_dict("records")] == ["1", "2"]
+    assert "None" not in set(batch["property_id"]) and "nan" not in set(batch["property_id"])
+    assert batch.attrs["rows_without_id"] == 2
@@ -1,7 +1,23 @@
+import json
 import streamlit as st
 import requests
 
 BACKEND_URL = "http://backend:8000/chat"
+STREAM_URL = f"{BACKEND_URL}/stream"
+
+
+def stream_events(prompt):
+    """Yields (event, data) pairs from the backend's Server-Sent Events stream."""
+    with requests.post(STREAM_URL, json={"message": prompt}, stream=True, timeout=(5, 300)) as response:
+        response.raise_for_status()
+        event = "message"
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):].strip())
+                event = "message"
+
 
 st.set_page_config(page_title="SmartSense Chatbot", page_icon="🤖")
 st.title("🤖 Real Estate Agent Built by Gautham")
@@ -13,24 +29,58 @@ if "messages" not in st.session_state:
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+        if message.get("sql"):
+            with st.expander("SQL"):
+                st.code(message["sql"], language="sql")
 
 if prompt := st.chat_input("Ask me about properties..."):
-    
+
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                response = requests.post(BACKEND_URL, json={"message": prompt})
-                response.raise_for_status()
-                
-                result = response.json()
-                answer = result.get("response", "No response from server.")
-                
-            except requests.exceptions.RequestException as e:
-                answer = f"Error connecting to backend: {e}"
-
-        st.markdown(answer)
-        st.session_state.messages.append({"role": "assistant", "content": answer})
\ No newline at end of file
+        status_placeholder = st.empty()
+        sql_placeholder = st.empty()
+        answer_placeholder = st.empty()
+        status_placeholder.caption("Thinking...")
+
+        answer = ""
+        sql = None
+        try:
+            # Render each event as it arrives instead of waiting for the whole agent run.
+            for event, data in stream_events(prompt):
+                if event == "sql":
+                    sql = data["sql"]
+                    status_placeholder.caption("Running query...")
+                    sql_placeholder.code(sql, language="sql")
+                elif event == "rows":
+                    if data.get("row_count") is not None:
+                        status_placeholder.caption(f"Query returned {data['row_count']} rows. Writing the answer...")
+                    else:
+                        status_placeholder.caption("Query finished. Writing the answer...")
+                elif event == "fallback":
+                    # The fast path gave up part way; the full agent starts over.
+                    answer = ""
+                    sql = None
+                    sql_placeholder.empty()
+                    answer_placeholder.empty()
+                    status_placeholder.caption("Taking a closer look...")
+                elif event == "token":
+                    answer += data["text"]
+                    answer_placeholder.markdown(answer + "▌")
+                elif event == "done":
+                    answer = data.get("response", answer)
+                    sql = data.get("sql", sql)
+                    status_placeholder.caption("Answered from cache." if data.get("cached") else "")
+                elif event == "error":
+                    answer = data["error"]
+                    status_placeholder.empty()
+
+        except requests.exceptions.RequestException as e:
+            answer = f"Error connecting to backend: {e}"
+            status_placeholder.empty()
+
+        answer = answer or "No response from server."
+        answer_placeholder.markdown(answer)
+        st.session_state.messages.append({"role": "assistant", "content": answer, "sql": sql})
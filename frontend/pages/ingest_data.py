@@ -1,26 +1,79 @@
+import time
 import streamlit as st
 import requests
 
 BACKEND_URL = "http://backend:8000/ingest"
+POLL_INTERVAL_SECONDS = 2
+FINISHED_STATUSES = ("completed", "failed", "cancelled", "superseded")
 
 st.set_page_config(page_title="Ingest Data", page_icon="📊")
 st.title("📊 Data Ingestion")
-st.markdown("Upload a new `Property_list.xlsx` file to trigger the ETL pipeline.")
+st.markdown("Upload a new `Property_list` file (Excel, CSV or Parquet) to trigger the ETL pipeline.")
 
-uploaded_file = st.file_uploader("Choose an Excel file", type=["xlsx"])
+uploaded_file = st.file_uploader("Choose a property file", type=["xlsx", "csv", "parquet"])
 
 if uploaded_file is not None:
     if st.button("Start Ingestion"):
         files = {"file": (uploaded_file.name, uploaded_file.getvalue())}
         
-        with st.spinner("Uploading file and starting background process..."):
+        with st.spinner("Uploading file and queueing the ingestion..."):
             try:
                 response = requests.post(BACKEND_URL, files=files)
                 response.raise_for_status()
                 
                 result = response.json()
-                st.success(result.get("message", "Success!"))
-                st.info("The ingestion is running in the background. It may take a few minutes for the data to appear.")
+                if "error" in result:
+                    st.error(result["error"])
+                else:
+                    st.success(result.get("message", "Success!"))
+                    st.session_state.ingest_job_id = result.get("job_id")
                 
             except requests.exceptions.RequestException as e:
-                st.error(f"Error connecting to backend: {e}")
\ No newline at end of file
+                st.error(f"Error connecting to backend: {e}")
+
+job_id = st.session_state.get("ingest_job_id")
+if job_id:
+    st.subheader("Ingestion progress")
+    st.caption(f"Job ID: {job_id}")
+
+    # Clicking this reruns the script, which also stops the polling loop below.
+    if st.button("Cancel Ingestion"):
+        try:
+            result = requests.post(f"{BACKEND_URL}/{job_id}/cancel").json()
+            st.info(result.get("message", result.get("error")))
+        except requests.exceptions.RequestException as e:
+            st.error(f"Error connecting to backend: {e}")
+
+    status_placeholder = st.empty()
+    progress_bar = st.progress(0)
+
+    while True:
+        try:
+            job = requests.get(f"{BACKEND_URL}/{job_id}").json()
+        except requests.exceptions.RequestException as e:
+            status_placeholder.error(f"Error connecting to backend: {e}")
+            break
+
+        if "error" in job:
+            status_placeholder.error(job["error"])
+            break
+
+        rows_total = job.get("rows_total") or 0
+        rows_processed = job.get("rows_processed") or 0
+        progress_bar.progress(min(rows_processed / rows_total, 1.0) if rows_total else 0.0)
+
+        details = f"**Status:** {job['status']} — {rows_processed}/{rows_total} rows"
+        if job.get("rows_per_second"):
+            details += f" at {job['rows_per_second']:.1f} rows/s"
+        if job.get("eta_seconds") is not None:
+            details += f", about {job['eta_seconds']:.0f}s remaining"
+        status_placeholder.markdown(details)
+
+        if job["status"] in FINISHED_STATUSES:
+            if job.get("message"):
+                st.info(job["message"])
+            for error in job.get("errors", []):
+                st.warning(error)
+            break
+
+        time.sleep(POLL_INTERVAL_SECONDS)
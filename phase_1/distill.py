@@ -0,0 +1,148 @@
+import argparse
+import glob
+import json
+import os
+import time
+import yaml
+from ultralytics import YOLO
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(SCRIPT_DIR, "My-First-Project-4")
+DATA_YAML_PATH = os.path.join(DATASET_DIR, "data.yaml")
+TRAINING_DIR = os.path.join(SCRIPT_DIR, "floorplan_training")
+DEFAULT_TEACHER = os.path.join(TRAINING_DIR, "run_1", "weights", "best.pt")
+IMAGE_SIZE = 512  # must match the training imgsz in phase_1.py
+# Kept low so the student also learns from the teacher's less certain boxes.
+PSEUDO_LABEL_CONF = 0.25
+CONF_THRESHOLD = 0.25  # what the backend counts rooms at
+
+
+def write_data_yaml(path, train_dir):
+    """
+    Writes a data.yaml with absolute paths. The Roboflow export uses
+    paths relative to its own folder, which breaks once it is copied.
+    """
+    with open(DATA_YAML_PATH) as f:
+        data = yaml.safe_load(f)
+    data["train"] = train_dir
+    data["val"] = os.path.join(DATASET_DIR, "valid", "images")
+    data["test"] = os.path.join(DATASET_DIR, "test", "images")
+    with open(path, "w") as f:
+        yaml.safe_dump(data, f)
+    return path
+
+
+def build_distillation_dataset(teacher_path, output_dir, conf=PSEUDO_LABEL_CONF):
+    """
+    Labels the train split with the teacher's predictions (YOLO txt format)
+    so the student learns to reproduce the large model rather than the raw
+    annotations. The valid split keeps its ground truth for evaluation.
+    """
+    teacher = YOLO(teacher_path)
+    image_dir = os.path.join(output_dir, "train", "images")
+    label_dir = os.path.join(output_dir, "train", "labels")
+    os.makedirs(image_dir, exist_ok=True)
+    os.makedirs(label_dir, exist_ok=True)
+
+    image_paths = sorted(glob.glob(os.path.join(DATASET_DIR, "train", "images", "*.jpg")))
+    print(f"Pseudo-labelling {len(image_paths)} training images with {teacher_path}...")
+    for image_path in image_paths:
+        name = os.path.basename(image_path)
+        link_path = os.path.join(image_dir, name)
+        if not os.path.exists(link_path):
+            os.symlink(image_path, link_path)
+
+        result = teacher(image_path, imgsz=IMAGE_SIZE, conf=conf, verbose=False)[0]
+        lines = []
+        for class_index, box in zip(result.boxes.cls.tolist(), result.boxes.xywhn.tolist()):
+            lines.append(f"{int(class_index)} " + " ".join(f"{value:.6f}" for value in box))
+        with open(os.path.join(label_dir, os.path.splitext(name)[0] + ".txt"), "w") as f:
+            f.write("\n".join(lines))
+
+    return write_data_yaml(os.path.join(output_dir, "data.yaml"), image_dir)
+
+
+def train_student(student, data_yaml, epochs):
+    print(f"Training {student} student on {data_yaml}...")
+    model = YOLO(f"{student}.pt")
+    model.train(
+        data=data_yaml,
+        epochs=epochs,
+        imgsz=IMAGE_SIZE,
+        project=TRAINING_DIR,
+        name=f"distill_{student}",
+    )
+    save_dir = model.trainer.save_dir
+    print(f"Student saved to: {save_dir}/weights/best.pt")
+    return os.path.join(save_dir, "weights", "best.pt")
+
+
+def evaluate(weights_path, data_yaml):
+    """mAP on the valid split plus single-image CPU throughput, the backend's serving pattern."""
+    model = YOLO(weights_path)
+    metrics = model.val(data=data_yaml, split="val", imgsz=IMAGE_SIZE, device="cpu", plots=False)
+
+    image_paths = sorted(glob.glob(os.path.join(DATASET_DIR, "valid", "images", "*.jpg")))
+    # The first call pays one-off setup; keep it out of the timing.
+    model(image_paths[0], imgsz=IMAGE_SIZE, conf=CONF_THRESHOLD, device="cpu", verbose=False)
+    start = time.perf_counter()
+    for image_path in image_paths:
+        model(image_path, imgsz=IMAGE_SIZE, conf=CONF_THRESHOLD, device="cpu", verbose=False)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "weights": weights_path,
+        "map50": float(metrics.box.map50),
+        "map50_95": float(metrics.box.map),
+        "images_per_second": len(image_paths) / elapsed,
+        "ms_per_image": 1000 * elapsed / len(image_paths),
+    }
+
+
+def distillation_report(teacher_path, student_path, data_yaml):
+    teacher = evaluate(teacher_path, data_yaml)
+    student = evaluate(student_path, data_yaml)
+    return {
+        "teacher": teacher,
+        "student": student,
+        "throughput_gain": student["images_per_second"] / teacher["images_per_second"],
+        "map50_lost": teacher["map50"] - student["map50"],
+        "map50_95_lost": teacher["map50_95"] - student["map50_95"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill the yolov8l floorplan detector into a small student.")
+    parser.add_argument("--teacher", default=DEFAULT_TEACHER, help="Trained teacher checkpoint.")
+    parser.add_argument("--student", choices=["yolov8n", "yolov8s"], default="yolov8n")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--report-only", metavar="STUDENT_WEIGHTS",
+                        help="Skip training and only report on an already trained student.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.teacher):
+        print(f"Error: Could not find '{args.teacher}'.")
+        print("Train the model with phase_1.py first or pass --teacher.")
+    elif not os.path.exists(DATA_YAML_PATH):
+        print(f"Error: Could not find '{DATA_YAML_PATH}'.")
+        print("Please download the dataset from Roboflow with phase_1.py first.")
+    else:
+        output_dir = os.path.join(TRAINING_DIR, f"distill_{args.student}_data")
+        if args.report_only:
+            student_path = args.report_only
+            data_yaml = write_data_yaml(
+                os.path.join(TRAINING_DIR, "eval_data.yaml"), os.path.join(DATASET_DIR, "train", "images")
+            )
+        else:
+            data_yaml = build_distillation_dataset(args.teacher, output_dir)
+            student_path = train_student(args.student, data_yaml, args.epochs)
+
+        report = distillation_report(args.teacher, student_path, data_yaml)
+        print("\n--- Distillation report (valid split) ---")
+        for key, value in report.items():
+            print(f"{key}: {value}")
+
+        report_path = os.path.join(os.path.dirname(os.path.dirname(student_path)), "distill_report.json")
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to: {report_path}")
@@ -0,0 +1,62 @@
+import argparse
+import os
+from ultralytics import YOLO
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+WEIGHTS_DIR = os.path.join(SCRIPT_DIR, "floorplan_training", "run_1", "weights")
+DEFAULT_WEIGHTS = os.path.join(WEIGHTS_DIR, "best.pt")
+DATA_YAML_PATH = os.path.join(SCRIPT_DIR, "My-First-Project-4", "data.yaml")
+IMAGE_SIZE = 512  # must match the training imgsz in phase_1.py
+
+
+def export_onnx(weights_path, int8=False):
+    """
+    Exports the detector to ONNX with a dynamic batch axis, so the backend
+    can keep running batched inference. With int8=True a dynamically
+    quantized copy (<name>_int8.onnx) is written next to it.
+    """
+    print(f"Exporting {weights_path} to ONNX...")
+    model = YOLO(weights_path)
+    onnx_path = model.export(format="onnx", imgsz=IMAGE_SIZE, dynamic=True, simplify=True)
+    print(f"ONNX model saved to: {onnx_path}")
+
+    if int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = onnx_path.replace(".onnx", "_int8.onnx")
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        print(f"INT8 ONNX model saved to: {int8_path}")
+        return int8_path
+    return onnx_path
+
+
+def export_openvino(weights_path, int8=False):
+    """
+    Exports the detector to OpenVINO IR. INT8 export calibrates on the
+    dataset in data.yaml, which needs the images downloaded locally.
+    """
+    print(f"Exporting {weights_path} to OpenVINO{' (INT8)' if int8 else ''}...")
+    model = YOLO(weights_path)
+    export_kwargs = {"format": "openvino", "imgsz": IMAGE_SIZE, "dynamic": True}
+    if int8:
+        export_kwargs.update(int8=True, data=DATA_YAML_PATH)
+    openvino_dir = model.export(**export_kwargs)
+    print(f"OpenVINO model saved to: {openvino_dir}")
+    return openvino_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the floorplan detector for CPU inference.")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="Path to the trained .pt checkpoint.")
+    parser.add_argument("--format", choices=["onnx", "openvino", "all"], default="onnx")
+    parser.add_argument("--int8", action="store_true", help="Also produce an INT8-quantized model.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.weights):
+        print(f"Error: Could not find '{args.weights}'.")
+        print("Train the model with phase_1.py first or pass --weights.")
+    else:
+        if args.format in ("onnx", "all"):
+            export_onnx(args.weights, int8=args.int8)
+        if args.format in ("openvino", "all"):
+            export_openvino(args.weights, int8=args.int8)
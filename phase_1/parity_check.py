@@ -0,0 +1,89 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import Counter
+from ultralytics import YOLO
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WEIGHTS = os.path.join(SCRIPT_DIR, "floorplan_training", "run_1", "weights", "best.pt")
+TEST_IMAGES_DIR = os.path.join(SCRIPT_DIR, "My-First-Project-4", "test", "images")
+IMAGE_SIZE = 512
+CONF_THRESHOLD = 0.25
+
+
+def room_counts(model, image_path):
+    start = time.perf_counter()
+    results = model(image_path, imgsz=IMAGE_SIZE, conf=CONF_THRESHOLD, verbose=False)
+    elapsed = time.perf_counter() - start
+    counts = Counter()
+    for result in results:
+        for class_index in result.boxes.cls.tolist():
+            counts[model.names[int(class_index)]] += 1
+    return counts, elapsed
+
+
+def check_parity(reference_path, candidate_path, image_paths):
+    """
+    Runs the torch reference and an exported candidate over the same images
+    and compares the per-class room counts that parse_floorplan reports.
+    """
+    reference = YOLO(reference_path)
+    candidate = YOLO(candidate_path, task="detect")
+    # The first call on each model pays one-off setup; keep it out of the timings.
+    room_counts(reference, image_paths[0])
+    room_counts(candidate, image_paths[0])
+
+    exact_matches = 0
+    abs_diff_by_class = Counter()
+    reference_seconds = 0.0
+    candidate_seconds = 0.0
+
+    for image_path in image_paths:
+        reference_counts, reference_elapsed = room_counts(reference, image_path)
+        candidate_counts, candidate_elapsed = room_counts(candidate, image_path)
+        reference_seconds += reference_elapsed
+        candidate_seconds += candidate_elapsed
+
+        if reference_counts == candidate_counts:
+            exact_matches += 1
+        else:
+            print(f"Mismatch on {os.path.basename(image_path)}: "
+                  f"torch={dict(reference_counts)} candidate={dict(candidate_counts)}")
+        for class_name in set(reference_counts) | set(candidate_counts):
+            abs_diff_by_class[class_name] += abs(reference_counts[class_name] - candidate_counts[class_name])
+
+    total = len(image_paths)
+    return {
+        "images": total,
+        "exact_match_rate": exact_matches / total,
+        "mean_abs_diff_by_class": {name: diff / total for name, diff in sorted(abs_diff_by_class.items())},
+        "torch_ms_per_image": 1000 * reference_seconds / total,
+        "candidate_ms_per_image": 1000 * candidate_seconds / total,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare an exported detector's room counts against best.pt.")
+    parser.add_argument("candidate", help="Exported model: .onnx file or *_openvino_model directory.")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="Reference torch checkpoint.")
+    parser.add_argument("--images", default=TEST_IMAGES_DIR, help="Directory of test images.")
+    parser.add_argument("--min-match-rate", type=float, default=0.95,
+                        help="Fail if fewer images than this have identical room counts.")
+    args = parser.parse_args()
+
+    image_paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")))
+    if not image_paths:
+        print(f"Error: No test images found in '{args.images}'.")
+        sys.exit(1)
+
+    report = check_parity(args.weights, args.candidate, image_paths)
+    print("\n--- Parity report ---")
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+    if report["exact_match_rate"] < args.min_match_rate:
+        print(f"FAIL: exact match rate below {args.min_match_rate:.0%}.")
+        sys.exit(1)
+    print("PASS")